@@ -0,0 +1,82 @@
+"""
+Hierarchical history summariser against a stub model.
+
+Builds a synthetic history (file updates sprinkled in), folds it with
+a summarize_fn that sleeps for a fixed latency, and reports wall time,
+number of model calls and the largest prompt for serial vs. parallel
+runs. Also checks that file-update turns survive the fold.
+
+    python benchmarks/bench_history_compressor.py [--turns 400] [--latency 0.2]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory import MemoryManager, GENESIS_MARKER
+from core.history_compressor import fold_history
+
+
+class StubModel:
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.max_prompt = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.calls += 1
+            self.max_prompt = max(self.max_prompt, len(prompt))
+        time.sleep(self.latency)
+        return f"summary of {len(prompt)} chars: " + prompt[-120:].replace("\n", " ")
+
+
+def build_history(memory, turns):
+    memory.save_genesis_block(GENESIS_MARKER + "\nFile: app.py\n```\nprint('hi')\n```\n")
+    for i in range(turns):
+        memory.save_turn("user", f"question {i}: " + "please refactor the cache registry " * 20)
+        memory.save_turn("model", f"answer {i}: " + "the registry now swaps atomically " * 30)
+        if i % 25 == 0:
+            memory.save_file_update(f"core/module_{i}.py", f"content {i}")
+    return memory.load_history()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--chunk-tokens", type=int, default=6000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = MemoryManager(os.path.join(tmp, ".zani", "history.jsonl"))
+        history = build_history(memory, args.turns)
+        updates = [m for m in history if memory.is_file_update(m["parts"][0]["text"])]
+
+        print(f"history: {len(history)} turns, "
+              f"{memory.token_counts()['summarizable']} summarizable tokens")
+
+        for workers in (1, 4, 8):
+            stub = StubModel(args.latency)
+            start = time.perf_counter()
+            folded = fold_history(history, memory, stub, 0.25,
+                                  chunk_tokens=args.chunk_tokens, max_workers=workers)
+            elapsed = time.perf_counter() - start
+
+            kept = [m for m in folded if memory.is_file_update(m["parts"][0]["text"])]
+            assert kept == updates, "file-update turns were not preserved"
+            assert sum(memory.is_summary(m["parts"][0]["text"]) for m in folded) == 1
+
+            print(f"workers={workers}: {elapsed:.2f}s, {stub.calls} model calls, "
+                  f"largest prompt ~{stub.max_prompt // 4} tokens, {len(folded)} turns after fold")
+
+
+if __name__ == "__main__":
+    main()
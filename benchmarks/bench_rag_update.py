@@ -0,0 +1,105 @@
+"""
+Retrieval index maintenance cost vs. change size.
+
+Builds a synthetic workspace, indexes it once, then edits k files and
+times RetrievalIndex.update() for each k. The update time should track
+k, not the size of the repository.
+
+    python benchmarks/bench_rag_update.py [--files 2000 5000]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.workspace import WorkspaceSnapshot
+from core.project_state import diff_projects
+from core.rag_engine import RetrievalIndex
+
+WORDS = [
+    "cache", "registry", "history", "snapshot", "token", "digest",
+    "manifest", "session", "summary", "project", "context", "worker",
+]
+
+
+def fake_module(rng, n_funcs=12):
+    lines = []
+    for i in range(n_funcs):
+        a, b = rng.sample(WORDS, 2)
+        lines.append(f"def {a}_{b}_{i}(value):")
+        lines.append(f"    # update the {a} from the {b}")
+        lines.append(f"    return compute{a.title()}{b.title()}(value) + {i}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def make_repo(root, n_files, rng):
+    for i in range(n_files):
+        path = os.path.join(root, f"pkg{i % 20}", f"mod_{i}.py")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(fake_module(rng))
+
+
+def timed_update(index, root, changed, rng):
+    for rel in changed:
+        with open(os.path.join(root, rel), "a", encoding="utf-8") as f:
+            f.write(fake_module(rng, 1))
+
+    snapshot = WorkspaceSnapshot.capture(root, {})
+    current = {rel: snapshot.hashes[rel] for rel in snapshot.files}
+
+    start = time.perf_counter()
+    added, modified, deleted = diff_projects(index.files, current)
+    rebuilt = index.update(snapshot, added, modified, deleted)
+    update_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.save()
+    save_s = time.perf_counter() - start
+
+    return rebuilt, update_s, save_s
+
+
+def run(n_files, changes, seed=0):
+    rng = random.Random(seed)
+    root = tempfile.mkdtemp(prefix="zani-bench-")
+    try:
+        make_repo(root, n_files, rng)
+        snapshot = WorkspaceSnapshot.capture(root, {})
+
+        start = time.perf_counter()
+        index = RetrievalIndex(root)
+        index.build(snapshot)
+        build_s = time.perf_counter() - start
+        index.save()
+
+        print(f"\nrepo: {n_files} files   full build: {build_s * 1000:.1f} ms")
+        print(f"{'changed':>8} {'reindexed':>10} {'update ms':>10} {'save ms':>9}")
+
+        for k in changes:
+            changed = rng.sample(snapshot.files, min(k, len(snapshot.files)))
+            rebuilt, update_s, save_s = timed_update(index, root, changed, rng)
+            print(f"{k:>8} {rebuilt:>10} {update_s * 1000:>10.2f} {save_s * 1000:>9.1f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, nargs="+", default=[1000, 4000])
+    parser.add_argument("--changes", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    for n in args.files:
+        run(n, args.changes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Response cache against a stub model.
+
+Asks the same chat question several times in a scratch project with
+the response cache enabled, through the real `zani chat` path, and
+reports model calls and wall time per ask. Checks that every repeat
+is served from the cache and that editing a file forces a new request.
+
+    python benchmarks/bench_response_cache.py [--asks 3] [--latency 0.5]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import zani
+from core import zani_brain
+from core.response_cache import ResponseCache
+
+
+class StubSession:
+
+    def __init__(self, brain):
+        self.brain = brain
+
+    def send_message(self, message):
+        from google.genai import types
+
+        self.brain.calls += 1
+        time.sleep(self.brain.latency)
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(
+                role="model", parts=[types.Part(text=f"answer {self.brain.calls}")]
+            ))],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=1000, candidates_token_count=10
+            )
+        )
+
+
+class StubBrain(zani_brain.ZaniBrain):
+
+    def __init__(self, latency):
+        self.model_name = "stub"
+        self.tools = [zani_brain.build_read_tools_schema()]
+        self.latency = latency
+        self.calls = 0
+
+    def start_session(self, history, cache_name=None):
+        return StubSession(self)
+
+
+def ask(brain, cfg, prompt):
+    calls = brain.calls
+    start = time.perf_counter()
+    with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+        zani.handle_run(brain, prompt, cfg)
+    return time.perf_counter() - start, brain.calls - calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--asks", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    cfg = zani.load_config()
+    cfg["response_cache"]["enabled"] = True
+    cfg["ui"]["stream"] = False
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            with open("app.py", "w") as f:
+                f.write("print('hi')\n")
+
+            brain = StubBrain(args.latency)
+            prompt = "what does app.py do?"
+
+            for i in range(args.asks):
+                elapsed, calls = ask(brain, cfg, prompt)
+                print(f"ask {i + 1}: {elapsed:.2f}s, {calls} model call(s)")
+                assert calls == (1 if i == 0 else 0), "identical ask was not served from the cache"
+
+            with open("app.py", "w") as f:
+                f.write("print('bye')\n")
+            elapsed, calls = ask(brain, cfg, prompt)
+            print(f"after edit: {elapsed:.2f}s, {calls} model call(s)")
+            assert calls == 1, "cache served an answer for a changed tree"
+
+            cache = ResponseCache(cfg)
+            print(f"cache: {cache.hits} hits, {cache.misses} misses, {len(cache.entries)} entries")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Cold start cost of the zani CLI.
+
+Runs `python -X importtime zani.py --help` (or any other argv) a few
+times, reports wall time and the slowest imports by cumulative time.
+Exits non-zero when the median exceeds the target, so it can gate CI.
+
+    python benchmarks/bench_startup.py [--runs 5] [--target-ms 100] [-- stop]
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY = os.path.join(ROOT, "zani.py")
+
+
+def run_once(argv):
+    cmd = [sys.executable, "-X", "importtime", ENTRY] + argv
+    start = time.perf_counter()
+    proc = subprocess.run(
+        cmd,
+        cwd=ROOT,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    return elapsed, proc.stderr
+
+
+def parse_importtime(stderr):
+    """{module: cumulative_us} from -X importtime output."""
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        try:
+            imports[name.strip()] = int(cumulative)
+        except ValueError:
+            continue  # header line
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=100.0)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("argv", nargs="*", default=["--help"])
+    args = parser.parse_args()
+
+    times = []
+    stderr = ""
+    for _ in range(args.runs):
+        elapsed, stderr = run_once(args.argv)
+        times.append(elapsed)
+
+    median = statistics.median(times)
+    print(f"zani {' '.join(args.argv)}: "
+          f"median {median:.1f} ms  min {min(times):.1f} ms  max {max(times):.1f} ms")
+
+    imports = parse_importtime(stderr)
+    heavy = sorted(imports.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+    print(f"\n{'cumulative ms':>14}  module")
+    for name, us in heavy:
+        print(f"{us / 1000:>14.2f}  {name}")
+
+    for marker in ("google.genai", "rich", "PIL", "numpy"):
+        loaded = [n for n in imports if n.strip() == marker]
+        if loaded:
+            print(f"\nwarning: {marker} is imported at startup")
+
+    if median > args.target_ms:
+        print(f"\nFAIL: {median:.1f} ms > {args.target_ms:.0f} ms target")
+        sys.exit(1)
+    print(f"\nOK: within {args.target_ms:.0f} ms target")
+
+
+if __name__ == "__main__":
+    main()
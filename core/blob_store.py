@@ -0,0 +1,69 @@
+import os
+import hashlib
+
+BLOB_DIR = ".zani/blobs"
+
+
+class BlobStore:
+    """
+    Content-addressed text store: every payload lives once under
+    blobs/<first two hex chars>/<rest of sha256>.
+    """
+
+    def __init__(self, root=BLOB_DIR):
+        self.root = root
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    # ----------------------------------------------------------
+    # PUT / GET
+    # ----------------------------------------------------------
+
+    def put(self, text):
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+        return digest
+
+    def get(self, digest):
+        with open(self._path(digest), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def exists(self, digest):
+        return os.path.exists(self._path(digest))
+
+    # ----------------------------------------------------------
+    # GARBAGE COLLECTION
+    # ----------------------------------------------------------
+
+    def gc(self, live):
+        """Remove every blob whose digest is not in live. Returns count."""
+        if not os.path.isdir(self.root):
+            return 0
+
+        removed = 0
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            if not os.path.isdir(folder):
+                continue
+            for rest in os.listdir(folder):
+                if prefix + rest in live or rest.endswith(".tmp"):
+                    continue
+                os.remove(os.path.join(folder, rest))
+                removed += 1
+            if not os.listdir(folder):
+                os.rmdir(folder)
+
+        return removed
+
+    def clear(self):
+        self.gc(set())
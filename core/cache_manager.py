@@ -3,6 +3,8 @@ import datetime
 import json
 import yaml
 
+from core.token_estimator import TokenEstimator
+
 class CacheManager:
     def __init__(self, config_path="config/settings.yaml"):
         self.registry_path = ".zani/registry.json"
@@ -10,11 +12,13 @@ class CacheManager:
         self.token_ratio = 4 
 
     def estimate_tokens(self, file_list):
-        total_chars = 0
+        # per-extension ratios, calibrated against the API's counts
+        estimator = TokenEstimator()
+        total = 0
         for path in file_list:
             if os.path.exists(path):
-                total_chars += os.path.getsize(path)
-        return total_chars // self.token_ratio
+                total += estimator.file_tokens(path, os.path.getsize(path))
+        return total
 
     def calculate_cost(self, tokens):
         # 2026 Storage Price: $1.00 per 1M tokens per hour
@@ -0,0 +1,73 @@
+import threading
+
+# workers started during this process, finished by finish_pending()
+PENDING = []
+
+
+class CacheWorker:
+    """
+    Uploads an explicit cache on a background thread.
+
+    on_ready(cache) runs on the worker thread as soon as the upload
+    completes; it is where the registry gets swapped to the new id.
+    The cache being replaced is only terminated in finish(), after the
+    caller's in-flight session is done with it.
+    """
+
+    def __init__(self, brain, ttl_hours, on_ready, replaces=None):
+        self.brain = brain
+        self.ttl_hours = ttl_hours
+        self.on_ready = on_ready
+        self.replaces = replaces
+
+        self.cache = None
+        self.error = None
+        self._thread = None
+
+    def start(self, snapshot):
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(snapshot,),
+            name="zani-cache-worker"
+        )
+        self._thread.start()
+        PENDING.append(self)
+        return self
+
+    def _run(self, snapshot):
+        try:
+            cache = self.brain.create_explicit_cache(snapshot.context, self.ttl_hours)
+        except Exception as e:
+            self.error = e
+            return
+
+        self.cache = cache
+        try:
+            self.on_ready(cache)
+        except Exception as e:
+            # never leave an unregistered cache billing storage
+            self.brain.terminate_cache(cache.name)
+            self.cache = None
+            self.error = e
+
+    def done(self):
+        return self._thread is not None and not self._thread.is_alive()
+
+    def finish(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return None
+
+        if self in PENDING:
+            PENDING.remove(self)
+
+        if self.cache is not None and self.replaces:
+            self.brain.terminate_cache(self.replaces)
+
+        return self.cache
+
+
+def finish_pending():
+    """Wait for every background upload. Returns [(worker, cache)]."""
+    return [(w, w.finish()) for w in list(PENDING)]
@@ -1,3 +1,32 @@
+from core.memory import GENESIS_MARKER, SUMMARY_PREFIX
+
+CHUNK_TOKENS = 6000
+MAX_WORKERS = 4
+MAX_REDUCE_ROUNDS = 6
+
+SUMMARY_RULES = (
+    "Preserve:\n"
+    "- decisions made\n"
+    "- file changes\n"
+    "- architectural modifications\n"
+    "Be concise but technically accurate."
+)
+
+
+# --------------------------------------------------------------
+# HIERARCHICAL SUMMARISER
+# --------------------------------------------------------------
+# Old turns are cut into token-bounded chunks and summarised in
+# parallel (map); the partial summaries are then merged in
+# token-bounded groups until one summary is left (reduce). No map or
+# reduce prompt exceeds chunk_tokens plus the instructions, whatever
+# the size of the history. The previous running summary is never
+# re-summarised: it only enters the final merge, as it is.
+#
+# summarize_fn(prompt) -> text is the only model dependency, so the
+# whole pipeline runs offline against a stub.
+# --------------------------------------------------------------
+
 def should_soft_reset(total_tokens, config):
     return total_tokens >= config["soft_reset_tokens"]
 
@@ -7,3 +36,169 @@ def split_history(history, keep_ratio):
     old = history[:-keep_n]
     recent = history[-keep_n:]
     return old, recent
+
+
+def estimate_tokens(text):
+    return len(text) // 4
+
+
+def partition(convo, memory):
+    """(protected, summaries, summarizable); protected = file updates."""
+    protected = []
+    summaries = []
+    summarizable = []
+
+    for m in convo:
+        text = m["parts"][0]["text"]
+
+        if memory.is_file_update(text):
+            protected.append(m)
+        elif memory.is_summary(text):
+            summaries.append(memory.part_text(m["parts"][0])[len(SUMMARY_PREFIX):].strip())
+        else:
+            summarizable.append(m)
+
+    return protected, summaries, summarizable
+
+
+def chunk_lines(lines, chunk_tokens):
+    """Group lines into chunks under chunk_tokens; oversized lines are split."""
+    max_chars = chunk_tokens * 4
+    chunks = []
+    current = []
+    size = 0
+
+    for line in lines:
+        pieces = [line[i:i + max_chars] for i in range(0, len(line), max_chars)] or [""]
+        for piece in pieces:
+            if current and size + len(piece) > max_chars:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _map(fn, items, max_workers):
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(fn, items))
+
+
+def _chunk_prompt(chunk):
+    return (
+        "Summarize this part of a conversation.\n"
+        + SUMMARY_RULES + "\n\n"
+        + chunk
+    )
+
+
+def _merge_prompt(parts):
+    body = "\n\n".join(f"Summary {i}:\n{p}" for i, p in enumerate(parts, 1))
+    return (
+        "Merge these consecutive summaries of one conversation, oldest "
+        "first, into a single summary.\n"
+        + SUMMARY_RULES + "\n\n"
+        + body
+    )
+
+
+def summarize_hierarchical(lines, summarize_fn, previous=None,
+                           chunk_tokens=CHUNK_TOKENS, max_workers=MAX_WORKERS):
+    chunks = chunk_lines(lines, chunk_tokens)
+    partials = _map(lambda c: summarize_fn(_chunk_prompt(c)) or "", chunks, max_workers)
+    partials = [p for p in partials if p.strip()]
+
+    rounds = 0
+    while len(partials) > 1 and rounds < MAX_REDUCE_ROUNDS:
+        groups = _group(partials, chunk_tokens)
+        partials = _map(lambda g: summarize_fn(_merge_prompt(g)) or "\n".join(g), groups, max_workers)
+        rounds += 1
+
+    summary = "\n\n".join(partials)
+
+    if previous and previous.strip():
+        if not summary:
+            return previous
+        summary = summarize_fn(_merge_prompt([previous, summary])) or previous + "\n\n" + summary
+
+    return summary
+
+
+def _group(parts, chunk_tokens):
+    """Consecutive parts, each group under chunk_tokens; oversized parts are split."""
+    groups = []
+    current = []
+    size = 0
+
+    for p in parts:
+        pieces = [p] if estimate_tokens(p) <= chunk_tokens else chunk_lines(p.split("\n"), chunk_tokens)
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and size + tokens > chunk_tokens:
+                groups.append(current)
+                current, size = [], 0
+            current.append(piece)
+            size += tokens
+
+    if current:
+        groups.append(current)
+    return groups
+
+
+# --------------------------------------------------------------
+# HISTORY FOLD
+# --------------------------------------------------------------
+
+def fold_history(history, memory, summarize_fn, keep_ratio,
+                 chunk_tokens=CHUNK_TOKENS, max_workers=MAX_WORKERS):
+    """
+    New history with the oldest summarizable turns folded into one
+    summary: genesis, file updates, summary, recent turns. Returns
+    None when there is nothing to fold.
+    """
+    genesis = None
+    convo = history
+    if history and GENESIS_MARKER in history[0]["parts"][0]["text"]:
+        genesis, convo = history[0], history[1:]
+
+    protected, summaries, summarizable = partition(convo, memory)
+
+    keep_n = max(2, int(len(summarizable) * keep_ratio))
+    old_block = summarizable[:-keep_n]
+    recent_block = summarizable[-keep_n:]
+
+    if not old_block:
+        return None
+
+    lines = [f"{m['role']}: {memory.part_text(m['parts'][0])}" for m in old_block]
+    previous = "\n\n".join(summaries) or None
+
+    summary_text = summarize_hierarchical(
+        lines, summarize_fn, previous,
+        chunk_tokens=chunk_tokens, max_workers=max_workers
+    ) or previous or "Summary unavailable."
+
+    new_history = []
+
+    if genesis:
+        new_history.append(genesis)
+
+    new_history.extend(protected)
+
+    new_history.append({
+        "role": "system",
+        "parts": [{
+            "text": SUMMARY_PREFIX + "\n" + summary_text
+        }]
+    })
+
+    new_history.extend(recent_block)
+
+    return new_history
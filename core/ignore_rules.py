@@ -0,0 +1,135 @@
+import re
+
+
+# --------------------------------------------------------------
+# GITIGNORE PATTERNS
+# --------------------------------------------------------------
+# One IgnoreRules per .gitignore (plus one for static_ignore).
+# Paths are matched relative to the directory that holds the file,
+# always with "/" separators. Rules without negations collapse into
+# a single regex per kind (files / directories); with negations the
+# rules are evaluated in order and the last match wins, as in git.
+# --------------------------------------------------------------
+
+def _translate(glob):
+    out = []
+    i, n = 0, len(glob)
+
+    while i < n:
+        c = glob[i]
+
+        if c == "*":
+            if glob.startswith("**/", i):
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if glob.startswith("**", i):
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = glob.find("]", i + 2)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = glob[i + 1:j]
+                if body[0] in "!^":
+                    body = "^" + body[1:]
+                out.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(glob[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+
+    return "".join(out)
+
+
+def compile_pattern(line):
+    """
+    (regex, negate, dir_only) for one gitignore line, or None for
+    blank lines and comments.
+    """
+    line = line.rstrip("\n")
+    if not line.strip() or line.startswith("#"):
+        return None
+
+    # trailing spaces are ignored unless escaped
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\"):
+        stripped += " "
+    line = stripped
+
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith("\\!") or line.startswith("\\#"):
+        line = line[1:]
+
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    anchored = "/" in line
+    line = line.lstrip("/")
+
+    body = _translate(line)
+    regex = f"^{body}$" if anchored else f"^(?:.*/)?{body}$"
+    return regex, negate, dir_only
+
+
+class IgnoreRules:
+
+    def __init__(self, lines):
+        self.rules = []
+        for line in lines:
+            rule = compile_pattern(line)
+            if rule:
+                regex, negate, dir_only = rule
+                self.rules.append((re.compile(regex), negate, dir_only))
+
+        self.has_negation = any(negate for _, negate, _ in self.rules)
+
+        if not self.has_negation:
+            self._files = self._union(r for r, _, dir_only in self.rules if not dir_only)
+            self._dirs = self._union(r for r, _, _ in self.rules)
+
+    @staticmethod
+    def _union(regexes):
+        patterns = [r.pattern for r in regexes]
+        if not patterns:
+            return None
+        return re.compile("|".join(f"(?:{p})" for p in patterns))
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return cls(f.readlines())
+        except OSError:
+            return None
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def match(self, rel, is_dir):
+        """True = ignored, False = re-included, None = no rule applies."""
+        if not self.has_negation:
+            regex = self._dirs if is_dir else self._files
+            if regex is not None and regex.match(rel):
+                return True
+            return None
+
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                result = not negate
+        return result
@@ -1,15 +1,67 @@
 import json
 import os
+import atexit
 import hashlib
+import weakref
+from array import array
+
+from core.blob_store import BlobStore
 
 GENESIS_MARKER = "--- INITIAL CODEBASE SNAPSHOT ---"
 FILE_UPDATE_PREFIX = "SYSTEM FILE UPDATE:"
 SUMMARY_PREFIX = "Conversation summary:"
 
+HISTORY_FILE = ".zani/history.jsonl"
+LEGACY_HISTORY_FILE = ".zani/history.json"
+
+# appends between fsyncs; flush() / process exit always sync
+FSYNC_EVERY = 8
+
+# running token counters kept per record class; "conversation" is
+# everything after the genesis block (protected + summarizable) and
+# "conversation_chars" its raw size, which the token estimator profiles
+TOKEN_CLASSES = ("genesis", "protected", "summarizable")
+TOKEN_COUNTERS = TOKEN_CLASSES + ("conversation", "conversation_chars")
+
+# texts longer than this go to the blob store; history keeps a preview
+BLOB_THRESHOLD = 4096
+BLOB_PREVIEW_CHARS = 200
+
+# live managers, flushed once at exit without keeping them alive
+_OPEN = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open():
+    for memory in list(_OPEN):
+        memory.flush()
+
 
 class MemoryManager:
-    def __init__(self, history_file=".zani/history.json"):
+    """
+    Conversation history as an append-only JSONL journal.
+
+    Every turn is one line in history.jsonl. history.idx holds the
+    journal length it covers followed by the byte offset of every
+    record (uint64), so single turns can be read without parsing the
+    whole file. compact() atomically replaces journal, index and
+    counters with the given history and drops unreferenced blobs.
+
+    Large texts (genesis snapshot, tool calls carrying whole files)
+    are kept once in the blob store. Their part holds a short preview
+    under "text" plus the blob digest; part_text() hydrates it.
+    """
+
+    def __init__(self, history_file=HISTORY_FILE, fsync_every=FSYNC_EVERY):
         self.history_file = history_file
+        self.index_file = os.path.splitext(history_file)[0] + ".idx"
+        self.counts_file = os.path.splitext(history_file)[0] + ".counts.json"
+        self.fsync_every = fsync_every
+        self._unsynced = 0
+        self.blobs = BlobStore(os.path.join(os.path.dirname(history_file), "blobs"))
+
+        _OPEN.add(self)
+        self._migrate_legacy()
 
     # ----------------------------------------------------------
     # LOAD
@@ -18,55 +70,86 @@ class MemoryManager:
     def load_history(self):
         if not os.path.exists(self.history_file):
             return []
-        try:
-            with open(self.history_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            return []
+
+        history = []
+        damaged = False
+
+        with open(self.history_file, "rb") as f:
+            for line in f:
+                record = self._parse(line)
+                if record is None:
+                    damaged = True
+                    continue
+                history.append(record)
+
+        # torn tail from a crash or a hand-edited line: rewrite clean
+        if damaged:
+            self._write(history)
+
+        return history
+
+    def turn_count(self):
+        return len(self._load_index())
+
+    def load_turn(self, i):
+        offsets = self._load_index()
+        if not -len(offsets) <= i < len(offsets):
+            raise IndexError(i)
+
+        with open(self.history_file, "rb") as f:
+            f.seek(offsets[i])
+            return self._parse(f.readline())
 
     # ----------------------------------------------------------
     # SAVE TURN
     # ----------------------------------------------------------
 
     def save_turn(self, role, text):
-        history = self.load_history()
-        history.append({
+        self._append([{
             "role": role,
-            "parts": [{"text": text}]
-        })
-        self._write(history)
+            "parts": [self._make_part(text)]
+        }])
+
+    def save_turns(self, turns):
+        """Append [(role, text)] in one write and sync once."""
+        if not turns:
+            return
+        self._append([
+            {"role": role, "parts": [self._make_part(text)]}
+            for role, text in turns
+        ])
+        self.flush()
 
     # ----------------------------------------------------------
     # GENESIS
     # ----------------------------------------------------------
 
     def save_genesis_block(self, project_context):
-        history = self.load_history()
+        genesis = {
+            "role": "user",
+            "parts": [self._make_part(project_context)]
+        }
 
-        if not history:
-            history.insert(0, {
-                "role": "user",
-                "parts": [{"text": project_context}]
-            })
-            self._write(history)
+        if not self.turn_count():
+            self._append([genesis])
             return
 
-        first = history[0]["parts"][0].get("text", "")
+        first = self.load_turn(0)["parts"][0].get("text", "")
         if GENESIS_MARKER not in first:
-            history.insert(0, {
-                "role": "user",
-                "parts": [{"text": project_context}]
-            })
+            history = self.load_history()
+            history.insert(0, genesis)
             self._write(history)
 
     # ----------------------------------------------------------
     # FILE UPDATE LOG
     # ----------------------------------------------------------
 
-    def save_file_update(self, filename, content):
+    def file_update_log(self, filename, content):
         digest = hashlib.sha256(content.encode()).hexdigest()[:12]
-        log = f"{FILE_UPDATE_PREFIX} {filename} | sha256={digest}"
-        self.save_turn("user", log)
+        return f"{FILE_UPDATE_PREFIX} {filename} | sha256={digest}"
+
+    def save_file_update(self, filename, content):
+        self.save_turn("user", self.file_update_log(filename, content))
 
     # ----------------------------------------------------------
     # HELPERS FOR SUMMARIZATION FILTERING
@@ -78,19 +161,251 @@ class MemoryManager:
     def is_summary(self, text):
         return text.startswith(SUMMARY_PREFIX)
 
+    def classify(self, record):
+        text = record["parts"][0].get("text", "") if record.get("parts") else ""
+        if GENESIS_MARKER in text:
+            return "genesis"
+        if self.is_file_update(text) or self.is_summary(text):
+            return "protected"
+        return "summarizable"
+
+    # ----------------------------------------------------------
+    # RUNNING TOKEN COUNTS
+    # ----------------------------------------------------------
+    # history.counts.json holds tokens per class plus the journal
+    # length it covers, so threshold checks never parse history.
+    # ----------------------------------------------------------
+
+    @staticmethod
+    def record_chars(record):
+        return sum(p.get("chars", len(p.get("text", ""))) for p in record.get("parts", []))
+
+    @staticmethod
+    def record_tokens(record):
+        return MemoryManager.record_chars(record) // 4 + 4
+
+    def _count(self, counts, record):
+        cls = self.classify(record)
+        tokens = self.record_tokens(record)
+        counts[cls] += tokens
+        if cls != "genesis":
+            counts["conversation"] += tokens
+            counts["conversation_chars"] += self.record_chars(record)
+
+    def token_counts(self):
+        counts = dict.fromkeys(TOKEN_COUNTERS, 0)
+        if not os.path.exists(self.history_file):
+            return counts
+
+        journal_len = os.path.getsize(self.history_file)
+        try:
+            with open(self.counts_file, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("covered") == journal_len and set(saved["tokens"]) == set(counts):
+                counts.update(saved["tokens"])
+                return counts
+        except (OSError, ValueError, KeyError):
+            pass
+
+        # out of sync (crash, older version): recount once
+        for record in self.load_history():
+            self._count(counts, record)
+        self._save_counts(os.path.getsize(self.history_file), counts)
+        return counts
+
+    def _save_counts(self, covered, counts):
+        tmp = self.counts_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"covered": covered, "tokens": counts}, f)
+        os.replace(tmp, self.counts_file)
+
+    # ----------------------------------------------------------
+    # BLOB PARTS
+    # ----------------------------------------------------------
+
+    def _make_part(self, text):
+        if len(text) <= BLOB_THRESHOLD:
+            return {"text": text}
+
+        digest = self.blobs.put(text)
+        preview = (
+            text[:BLOB_PREVIEW_CHARS]
+            + f"\n... [{len(text)} chars in blob {digest[:12]}]"
+        )
+        return {"text": preview, "blob": digest, "chars": len(text)}
+
+    def part_text(self, part):
+        """Full text of a stored part, reading its blob if it has one."""
+        digest = part.get("blob")
+        if not digest:
+            return part["text"]
+        return self.blobs.get(digest)
+
     # ----------------------------------------------------------
     # CLEAR
     # ----------------------------------------------------------
 
     def clear_history(self):
-        if os.path.exists(self.history_file):
-            os.remove(self.history_file)
+        for path in (self.history_file, self.index_file, self.counts_file, self._legacy_file()):
+            if path and os.path.exists(path):
+                os.remove(path)
+        self.blobs.clear()
+        self._unsynced = 0
 
     # ----------------------------------------------------------
-    # WRITE
+    # APPEND / FLUSH
     # ----------------------------------------------------------
 
+    def _append(self, records):
+        os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+        offsets = self._load_index()
+        counts = self.token_counts()
+
+        with open(self.history_file, "a+b") as f:
+            end = f.seek(0, os.SEEK_END)
+
+            # never glue a new record onto a torn last line
+            if end:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+                    end += 1
+
+            for record in records:
+                line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                offsets.append(end)
+                f.write(line)
+                end += len(line)
+                self._count(counts, record)
+
+            f.flush()
+            self._unsynced += len(records)
+            if self._unsynced >= self.fsync_every:
+                os.fsync(f.fileno())
+                self._unsynced = 0
+
+        self._save_index(end, offsets)
+        self._save_counts(end, counts)
+
+    def flush(self):
+        if not self._unsynced or not os.path.exists(self.history_file):
+            return
+        with open(self.history_file, "rb") as f:
+            os.fsync(f.fileno())
+        self._unsynced = 0
+
+    # ----------------------------------------------------------
+    # OFFSET INDEX
+    # ----------------------------------------------------------
+
+    def _load_index(self):
+        if not os.path.exists(self.history_file):
+            return array("Q")
+
+        journal_len = os.path.getsize(self.history_file)
+        covered = 0
+        offsets = array("Q")
+
+        if os.path.exists(self.index_file):
+            raw = array("Q")
+            with open(self.index_file, "rb") as f:
+                data = f.read()
+            if data and len(data) % raw.itemsize == 0:
+                raw.frombytes(data)
+                covered, offsets = raw[0], raw[1:]
+
+        if covered > journal_len:
+            covered, offsets = 0, array("Q")
+
+        if covered < journal_len:
+            # index lags the journal: only scan the uncovered tail
+            with open(self.history_file, "rb") as f:
+                f.seek(covered)
+                pos = covered
+                for line in f:
+                    if self._parse(line) is not None:
+                        offsets.append(pos)
+                    pos += len(line)
+            self._save_index(journal_len, offsets)
+
+        return offsets
+
+    def _save_index(self, covered, offsets):
+        data = array("Q", [covered])
+        data.extend(offsets)
+        tmp = self.index_file + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data.tobytes())
+        os.replace(tmp, self.index_file)
+
+    # ----------------------------------------------------------
+    # WRITE (COMPACTION)
+    # ----------------------------------------------------------
+
+    def compact(self, history):
+        """Rewrite the journal as exactly `history` (e.g. after a summary fold)."""
+        self._write(history)
+
     def _write(self, history):
         os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
-        with open(self.history_file, "w", encoding="utf-8") as f:
-            json.dump(history, f, indent=2)
+
+        offsets = array("Q")
+        pos = 0
+        tmp = self.history_file + ".tmp"
+        live = set()
+        counts = dict.fromkeys(TOKEN_COUNTERS, 0)
+
+        with open(tmp, "wb") as f:
+            for record in history:
+                record = dict(record)
+                record["parts"] = [
+                    p if "blob" in p or "text" not in p else self._make_part(p["text"])
+                    for p in record.get("parts", [])
+                ]
+                live.update(p["blob"] for p in record["parts"] if "blob" in p)
+                self._count(counts, record)
+
+                line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                offsets.append(pos)
+                f.write(line)
+                pos += len(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp, self.history_file)
+        self._save_index(pos, offsets)
+        self._save_counts(pos, counts)
+        self._unsynced = 0
+
+        self.blobs.gc(live)
+
+    # ----------------------------------------------------------
+    # LEGACY history.json
+    # ----------------------------------------------------------
+
+    def _legacy_file(self):
+        if self.history_file == HISTORY_FILE:
+            return LEGACY_HISTORY_FILE
+        return None
+
+    def _migrate_legacy(self):
+        legacy = self._legacy_file()
+        if not legacy or os.path.exists(self.history_file) or not os.path.exists(legacy):
+            return
+        try:
+            with open(legacy, "r", encoding="utf-8") as f:
+                history = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        self._write(history)
+        os.replace(legacy, legacy + ".bak")
+
+    @staticmethod
+    def _parse(line):
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
@@ -1,39 +1,244 @@
 import os
+import json
+import time
 import hashlib
 
-CHUNK = 8192
+from core.token_estimator import TokenEstimator, count_non_ascii
 
+CHUNK = 1024 * 1024
 
-def hash_file(path: str) -> str:
-    h = hashlib.sha256()
+DEFAULT_ALGORITHM = "sha256"
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+OVERLAY_MARKER = "--- FILES CHANGED SINCE CACHE ---"
+
+MANIFEST_PATH = ".zani/manifest.json"
+MANIFEST_VERSION = 2
+
+# bytes per token when no calibrated estimate is at hand
+TOKEN_RATIO = 4
+
+
+# --------------------------------------------------------------
+# HASHING ENGINE
+# --------------------------------------------------------------
+# hashlib releases the GIL while digesting large buffers, so a
+# thread pool gives real parallelism for both the I/O and the
+# hashing. Files are read in CHUNK-sized blocks, which the
+# non-ASCII count needs as bytes anyway, so memory stays bounded
+# whatever the file size.
+# --------------------------------------------------------------
+
+def _map_files(fn, paths, algorithm, workers):
+    """{path: fn(path)} on a thread pool; unreadable files are left out."""
+    hashlib.new(algorithm)  # fail fast on an unknown algorithm
+
+    def _one(path):
+        try:
+            return path, fn(path)
+        except OSError:
+            return path, None
+
+    paths = list(paths)
+    workers = workers or DEFAULT_WORKERS
+
+    if len(paths) < 2 or workers <= 1:
+        results = map(_one, paths)
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            results = list(pool.map(_one, paths))
+
+    return {p: r for p, r in results if r is not None}
+
+
+def digest_file(path: str, algorithm: str = DEFAULT_ALGORITHM):
+    """(digest, non_ascii_bytes) in one pass; the count feeds the token estimator."""
+    h = hashlib.new(algorithm)
+    non_ascii = 0
     with open(path, "rb") as f:
         while chunk := f.read(CHUNK):
             h.update(chunk)
-    return h.hexdigest()
+            non_ascii += count_non_ascii(chunk)
+    return h.hexdigest(), non_ascii
 
 
-def scan_project(root: str, allowed_files: list[str]):
+def digest_files(paths, algorithm: str = DEFAULT_ALGORITHM, workers=None) -> dict:
+    """
+    Hash many files concurrently.
+    Returns {path: (digest, non_ascii_bytes)}; unreadable files are left out.
+    """
+    return _map_files(lambda path: digest_file(path, algorithm), paths, algorithm, workers)
+
+
+def read_files(paths, algorithm: str = DEFAULT_ALGORITHM, workers=None) -> dict:
+    """
+    Like digest_files, but keeps the bytes so callers that also need
+    the content do not open the file a second time.
+    Returns {path: (digest, data)}.
+    """
+    def _read(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        return hashlib.new(algorithm, data).hexdigest(), data
+
+    return _map_files(_read, paths, algorithm, workers)
+
+
+# --------------------------------------------------------------
+# MANIFEST
+# --------------------------------------------------------------
+# One entry per file: size, mtime_ns, inode and the digest that
+# was computed for that stat tuple. A file is only rehashed when
+# its stat tuple no longer matches. The non-ASCII byte count is
+# taken in the same pass, so token estimates never reread a file
+# whose digest is unchanged.
+# --------------------------------------------------------------
+
+def load_manifest(root: str, manifest_path: str = MANIFEST_PATH) -> dict:
+    path = os.path.join(root, manifest_path)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data
+
+
+def save_manifest(root: str, manifest: dict, manifest_path: str = MANIFEST_PATH):
+    path = os.path.join(root, manifest_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def manifest_entry(rel, st, digest, non_ascii, estimator) -> dict:
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "inode": st.st_ino,
+        "digest": digest,
+        "non_ascii": non_ascii,
+        "tokens": estimator.file_tokens(rel, st.st_size, non_ascii)
+    }
+
+
+def _stat_matches(entry, st, scanned_at_ns) -> bool:
+    if not entry:
+        return False
+    if entry["size"] != st.st_size:
+        return False
+    if entry["mtime_ns"] != st.st_mtime_ns:
+        return False
+    if entry["inode"] != st.st_ino:
+        return False
+    # A file touched at or after the previous scan started may have
+    # changed again within the same mtime tick ("racy clean"), so its
+    # stored digest cannot be trusted.
+    return st.st_mtime_ns < scanned_at_ns
+
+
+def scan_project(
+    root: str,
+    allowed_files: list[str],
+    full_verify: bool = False,
+    algorithm: str = DEFAULT_ALGORITHM,
+    workers=None,
+    manifest_path: str = MANIFEST_PATH,
+    contents=None,
+    stats=None,
+    non_ascii=None,
+    estimator=None
+):
     """
     Returns:
-        file_hashes: {rel_path: sha256}
+        file_hashes: {rel_path: digest}
         total_bytes: int
         file_sizes: {rel_path: size}
+
+    Digests are reused from the persisted manifest for every file
+    whose (size, mtime_ns, inode) is unchanged. full_verify ignores
+    the manifest and rehashes everything. A manifest written with a
+    different algorithm is ignored as a whole.
+
+    If a contents dict is passed, every file that had to be read is
+    kept in it as {rel_path: bytes}. stats ({rel_path: stat_result},
+    e.g. from the directory walk) saves a second stat per file. A
+    non_ascii dict is filled with {rel_path: non-ASCII bytes}, which
+    the token estimator (estimator, default: the workspace's
+    calibrated one) uses for the per-file tokens in the manifest.
     """
-    hashes = {}
-    sizes = {}
-    total = 0
+    estimator = estimator or TokenEstimator(root)
+
+    manifest = {} if full_verify else load_manifest(root, manifest_path)
+    if manifest.get("algorithm", DEFAULT_ALGORITHM) != algorithm:
+        manifest = {}
+    old_entries = manifest.get("files", {})
+    scanned_at_ns = manifest.get("scanned_at_ns", 0)
+
+    started_ns = time.time_ns()
+
+    known = stats or {}
+    stats = {}
+    stale = {}
 
     for rel in allowed_files:
         full = os.path.join(root, rel)
-        if not os.path.exists(full):
-            continue
+        st = known.get(rel)
+        if st is None:
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+
+        stats[rel] = st
+        if not _stat_matches(old_entries.get(rel), st, scanned_at_ns):
+            stale[rel] = full
+
+    if contents is None:
+        fresh = digest_files(stale.values(), algorithm, workers)
+    else:
+        rel_of = {full: rel for rel, full in stale.items()}
+        fresh = {}
+        for full, (digest, data) in read_files(stale.values(), algorithm, workers).items():
+            fresh[full] = (digest, count_non_ascii(data))
+            contents[rel_of[full]] = data
+
+    hashes = {}
+    sizes = {}
+    entries = {}
+    total = 0
 
-        size = os.path.getsize(full)
-        digest = hash_file(full)
+    for rel, st in stats.items():
+        if rel in stale:
+            if stale[rel] not in fresh:
+                continue
+            digest, wide = fresh[stale[rel]]
+        else:
+            digest = old_entries[rel]["digest"]
+            wide = old_entries[rel]["non_ascii"]
 
         hashes[rel] = digest
-        sizes[rel] = size
-        total += size
+        sizes[rel] = st.st_size
+        total += st.st_size
+
+        entries[rel] = manifest_entry(rel, st, digest, wide, estimator)
+        if non_ascii is not None:
+            non_ascii[rel] = wide
+
+    save_manifest(root, {
+        "version": MANIFEST_VERSION,
+        "algorithm": algorithm,
+        "scanned_at_ns": started_ns,
+        "project_tokens": sum(e["tokens"] for e in entries.values()),
+        "files": entries
+    }, manifest_path)
 
     return hashes, total, sizes
 
@@ -56,22 +261,58 @@ def diff_projects(old_hashes, new_hashes):
     return added, modified, deleted
 
 
-def compute_change_magnitude(added, modified, deleted, new_sizes, old_sizes, total_old_bytes):
+def compute_change_magnitude(added, modified, deleted, new_sizes, old_sizes, total_old_bytes,
+                             new_tokens=None, old_tokens=None):
+    """
+    new_tokens / old_tokens ({rel_path: tokens}, e.g. calibrated
+    estimates) are used per file when given; other files fall back
+    to size // TOKEN_RATIO.
+    """
+    new_tokens = new_tokens or {}
+    old_tokens = old_tokens or {}
+
     changed_bytes = 0
+    changed_tokens = 0
 
     for f in added:
         changed_bytes += new_sizes.get(f, 0)
+        changed_tokens += new_tokens.get(f, new_sizes.get(f, 0) // TOKEN_RATIO)
 
     for f in modified:
         changed_bytes += new_sizes.get(f, 0)
+        changed_tokens += new_tokens.get(f, new_sizes.get(f, 0) // TOKEN_RATIO)
 
     for f in deleted:
         changed_bytes += old_sizes.get(f, 0)
+        changed_tokens += old_tokens.get(f, old_sizes.get(f, 0) // TOKEN_RATIO)
 
     percent = 0.0
     if total_old_bytes > 0:
         percent = (changed_bytes / total_old_bytes) * 100
 
-    changed_tokens = changed_bytes // 4
-
     return changed_bytes, percent, changed_tokens
+
+
+def build_delta_overlay(added, modified, deleted, read_text):
+    """
+    Context turn that brings a stale cache up to date: current content
+    of added and modified files, tombstones for deleted ones.
+    read_text(rel) returns the file text or None.
+    """
+    parts = [
+        OVERLAY_MARKER + "\n",
+        "These files changed after the cached project snapshot was taken.\n"
+        "They supersede the cached versions.\n",
+    ]
+
+    for label, files in (("ADDED", added), ("MODIFIED", modified)):
+        for f in sorted(files):
+            text = read_text(f)
+            if text is None:
+                continue
+            parts.append(f"\n{label} File: {f}\n```\n{text}\n```\n")
+
+    for f in sorted(deleted):
+        parts.append(f"\nDELETED File: {f}\n")
+
+    return "".join(parts)
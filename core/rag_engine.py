@@ -0,0 +1,445 @@
+import os
+import re
+import json
+import math
+
+import numpy as np
+
+from core.project_state import diff_projects
+
+INDEX_DIR = ".zani/rag"
+INDEX_VERSION = 1
+
+RETRIEVAL_MARKER = "--- RETRIEVED PROJECT CONTEXT ---"
+
+CHUNK_LINES = 60
+CHUNK_OVERLAP = 10
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+TF_MAX = np.iinfo(np.uint16).max
+
+# segments no longer referenced by any file, kept so that reverting or
+# restoring a file does not re-tokenise it
+MAX_ORPHANS = 512
+
+
+# --------------------------------------------------------------
+# CODE-AWARE TOKENIZER
+# --------------------------------------------------------------
+# Identifiers are kept whole and also split on snake_case and
+# camelCase boundaries, so "buildProjectContext" matches a prompt
+# asking about "project context".
+# --------------------------------------------------------------
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+STOPWORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "all", "can",
+    "this", "that", "with", "from", "have", "was", "what", "how",
+    "self", "none", "true", "false", "return", "def", "import",
+}
+
+
+def tokenize(text):
+    tokens = []
+    for word in _WORD.findall(text):
+        lower = word.lower()
+        pieces = [p.lower() for part in word.split("_") for p in _CAMEL.findall(part)]
+
+        if len(lower) > 1 and lower not in STOPWORDS:
+            tokens.append(lower)
+        if len(pieces) > 1:
+            tokens.extend(p for p in pieces if len(p) > 1 and p not in STOPWORDS)
+
+    return tokens
+
+
+def chunk_lines(text, size=CHUNK_LINES, overlap=CHUNK_OVERLAP):
+    """Yields (start_line, end_line, text); line numbers are 1-based."""
+    lines = text.split("\n")
+    step = max(1, size - overlap)
+
+    for start in range(0, max(1, len(lines)), step):
+        end = min(len(lines), start + size)
+        yield start + 1, end, "\n".join(lines[start:end])
+        if end >= len(lines):
+            break
+
+
+# --------------------------------------------------------------
+# RETRIEVAL INDEX
+# --------------------------------------------------------------
+# One segment per distinct file digest. A segment holds its chunks
+# (line ranges and lengths) and a CSR posting list: for chunk i the
+# entries terms[ptr[i]:ptr[i+1]] / tfs[ptr[i]:ptr[i+1]].
+# --------------------------------------------------------------
+
+class RetrievalIndex:
+
+    def __init__(self, root, chunk_size=CHUNK_LINES, overlap=CHUNK_OVERLAP):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+        self.vocab = {}
+        self.files = {}
+        self.segments = {}
+        self.orphans = []
+
+        self._flat = None
+
+    # ----------------------------------------------------------
+    # BUILD
+    # ----------------------------------------------------------
+
+    def _term_id(self, term):
+        tid = self.vocab.get(term)
+        if tid is None:
+            tid = len(self.vocab)
+            self.vocab[term] = tid
+        return tid
+
+    def _build_segment(self, text):
+        starts, ends, lengths, ptr, terms, tfs = [], [], [], [0], [], []
+
+        chunks = chunk_lines(text, self.chunk_size, self.overlap) if text else ()
+        for start, end, chunk in chunks:
+            counts = {}
+            for tok in tokenize(chunk):
+                tid = self._term_id(tok)
+                counts[tid] = counts.get(tid, 0) + 1
+
+            starts.append(start)
+            ends.append(end)
+            lengths.append(sum(counts.values()))
+            terms.extend(counts.keys())
+            tfs.extend(min(c, TF_MAX) for c in counts.values())
+            ptr.append(len(terms))
+
+        return {
+            "starts": np.array(starts, dtype=np.int32),
+            "ends": np.array(ends, dtype=np.int32),
+            "lengths": np.array(lengths, dtype=np.int32),
+            "ptr": np.array(ptr, dtype=np.int64),
+            "terms": np.array(terms, dtype=np.int32),
+            "tfs": np.array(tfs, dtype=np.uint16),
+        }
+
+    def _ensure_segment(self, snapshot, rel):
+        digest = snapshot.hashes[rel]
+        self.files[rel] = digest
+        if digest in self.orphans:
+            self.orphans.remove(digest)
+        if digest not in self.segments:
+            # undecodable files get an empty segment so they are
+            # still recorded and do not force a rebuild every run
+            self.segments[digest] = self._build_segment(snapshot.text(rel) or "")
+            return True
+        return False
+
+    def build(self, snapshot):
+        self.vocab = {}
+        self.files = {}
+        self.segments = {}
+        self.orphans = []
+
+        for rel in snapshot.files:
+            self._ensure_segment(snapshot, rel)
+
+        self._flat = None
+
+    # ----------------------------------------------------------
+    # INCREMENTAL UPDATE
+    # ----------------------------------------------------------
+
+    def update(self, snapshot, added, modified, deleted):
+        """
+        Apply a diff_projects() result. Only files whose new digest has
+        no segment yet are chunked and tokenised; renames and reverts
+        reuse the existing segment. Returns the number of files that
+        were actually re-indexed.
+        """
+        rebuilt = 0
+        released = [self.files[rel] for rel in deleted + modified if rel in self.files]
+
+        for rel in deleted:
+            self.files.pop(rel, None)
+
+        for rel in added + modified:
+            rebuilt += self._ensure_segment(snapshot, rel)
+
+        if released:
+            referenced = set(self.files.values())
+            for digest in released:
+                if digest not in referenced and digest not in self.orphans:
+                    self.orphans.append(digest)
+
+        while len(self.orphans) > MAX_ORPHANS:
+            self.segments.pop(self.orphans.pop(0), None)
+
+        if added or modified or deleted:
+            self._flat = None
+
+        return rebuilt
+
+    # ----------------------------------------------------------
+    # PERSISTENCE
+    # ----------------------------------------------------------
+
+    def _dir(self):
+        return os.path.join(self.root, INDEX_DIR)
+
+    def save(self):
+        os.makedirs(self._dir(), exist_ok=True)
+
+        digests = sorted(self.segments)
+        arrays = {"chunk_counts": np.array(
+            [len(self.segments[d]["starts"]) for d in digests], dtype=np.int64
+        )}
+        for key in ("starts", "ends", "lengths", "terms", "tfs"):
+            arrays[key] = (
+                np.concatenate([self.segments[d][key] for d in digests])
+                if digests else np.zeros(0, dtype=np.int32)
+            )
+        # per-segment ptr arrays are stored as posting counts per chunk
+        arrays["posting_counts"] = (
+            np.concatenate([np.diff(self.segments[d]["ptr"]) for d in digests])
+            if digests else np.zeros(0, dtype=np.int64)
+        )
+
+        tmp = os.path.join(self._dir(), "index.tmp.npz")
+        np.savez(tmp, **arrays)
+        os.replace(tmp, os.path.join(self._dir(), "index.npz"))
+
+        meta = {
+            "version": INDEX_VERSION,
+            "chunk_size": self.chunk_size,
+            "overlap": self.overlap,
+            "vocab": sorted(self.vocab, key=self.vocab.get),
+            "files": self.files,
+            "digests": digests,
+            "orphans": self.orphans,
+        }
+        tmp = os.path.join(self._dir(), "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, separators=(",", ":"))
+        os.replace(tmp, os.path.join(self._dir(), "meta.json"))
+
+    @classmethod
+    def load(cls, root, chunk_size=CHUNK_LINES, overlap=CHUNK_OVERLAP):
+        index = cls(root, chunk_size, overlap)
+        meta_path = os.path.join(index._dir(), "meta.json")
+        arrays_path = os.path.join(index._dir(), "index.npz")
+
+        if not (os.path.exists(meta_path) and os.path.exists(arrays_path)):
+            return index
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = dict(np.load(arrays_path))
+        except (OSError, ValueError):
+            return index
+
+        if (meta.get("version") != INDEX_VERSION
+                or meta.get("chunk_size") != chunk_size
+                or meta.get("overlap") != overlap):
+            return index
+
+        index.vocab = {t: i for i, t in enumerate(meta["vocab"])}
+        index.files = meta["files"]
+        index.orphans = meta.get("orphans", [])
+
+        chunk_pos = 0
+        post_pos = 0
+        for digest, n in zip(meta["digests"], arrays["chunk_counts"]):
+            n = int(n)
+            counts = arrays["posting_counts"][chunk_pos:chunk_pos + n]
+            ptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(counts, out=ptr[1:])
+            total = int(ptr[-1])
+
+            index.segments[digest] = {
+                "starts": arrays["starts"][chunk_pos:chunk_pos + n],
+                "ends": arrays["ends"][chunk_pos:chunk_pos + n],
+                "lengths": arrays["lengths"][chunk_pos:chunk_pos + n],
+                "ptr": ptr,
+                "terms": arrays["terms"][post_pos:post_pos + total],
+                "tfs": arrays["tfs"][post_pos:post_pos + total],
+            }
+            chunk_pos += n
+            post_pos += total
+
+        return index
+
+    # ----------------------------------------------------------
+    # QUERY
+    # ----------------------------------------------------------
+
+    def _flatten(self):
+        """Concatenate every file's chunks into global arrays for scoring."""
+        if self._flat is not None:
+            return self._flat
+
+        paths, starts, ends, lengths, terms, tfs, owner = [], [], [], [], [], [], []
+        chunk_base = 0
+
+        for rel in sorted(self.files):
+            seg = self.segments.get(self.files[rel])
+            if seg is None:
+                continue
+            n = len(seg["starts"])
+            paths.extend([rel] * n)
+            starts.append(seg["starts"])
+            ends.append(seg["ends"])
+            lengths.append(seg["lengths"])
+            terms.append(seg["terms"])
+            tfs.append(seg["tfs"])
+            owner.append(np.repeat(np.arange(chunk_base, chunk_base + n), np.diff(seg["ptr"])))
+            chunk_base += n
+
+        def cat(parts, dtype):
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+        self._flat = {
+            "paths": paths,
+            "starts": cat(starts, np.int32),
+            "ends": cat(ends, np.int32),
+            "lengths": cat(lengths, np.int32).astype(np.float64),
+            "terms": cat(terms, np.int32),
+            "tfs": cat(tfs, np.uint16).astype(np.float64),
+            "owner": cat(owner, np.int64),
+        }
+        self._flat["df"] = np.bincount(self._flat["terms"], minlength=len(self.vocab))
+        return self._flat
+
+    def search(self, query, top_k):
+        """Returns [(score, path, start_line, end_line)] best first."""
+        flat = self._flatten()
+        n_chunks = len(flat["paths"])
+        if not n_chunks:
+            return []
+
+        q_ids = np.array(
+            sorted({self.vocab[t] for t in tokenize(query) if t in self.vocab}),
+            dtype=np.int32
+        )
+        if not len(q_ids):
+            return []
+
+        mask = np.isin(flat["terms"], q_ids)
+        terms = flat["terms"][mask]
+        tfs = flat["tfs"][mask]
+        owner = flat["owner"][mask]
+
+        df = flat["df"][terms]
+        idf = np.log(1.0 + (n_chunks - df + 0.5) / (df + 0.5))
+
+        avg_len = max(1.0, float(flat["lengths"].mean()))
+        norm = K1 * (1.0 - B + B * flat["lengths"][owner] / avg_len)
+        contrib = idf * tfs * (K1 + 1.0) / (tfs + norm)
+
+        scores = np.bincount(owner, weights=contrib, minlength=n_chunks)
+
+        k = min(top_k, int((scores > 0).sum()))
+        if not k:
+            return []
+
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+
+        return [
+            (float(scores[i]), flat["paths"][i], int(flat["starts"][i]), int(flat["ends"][i]))
+            for i in best
+        ]
+
+
+# --------------------------------------------------------------
+# CONTEXT SELECTION
+# --------------------------------------------------------------
+
+def load_index(snapshot, cfg):
+    """Load the on-disk index and bring it up to date with snapshot."""
+    rcfg = cfg.get("retrieval", {})
+    index = RetrievalIndex.load(
+        snapshot.root,
+        rcfg.get("chunk_lines", CHUNK_LINES),
+        rcfg.get("chunk_overlap", CHUNK_OVERLAP)
+    )
+
+    current = {rel: snapshot.hashes[rel] for rel in snapshot.files}
+    added, modified, deleted = diff_projects(index.files, current)
+
+    if added or modified or deleted:
+        index.update(snapshot, added, modified, deleted)
+        index.save()
+
+    return index
+
+
+def project_map(files, max_files):
+    """File list, or per-directory file counts when the tree is large."""
+    if len(files) <= max_files:
+        return "".join(f"- {rel}\n" for rel in files)
+
+    dirs = {}
+    for rel in files:
+        parts = rel.replace(os.sep, "/").split("/")
+        top = parts[0] if len(parts) > 1 else "."
+        dirs[top] = dirs.get(top, 0) + 1
+    return "".join(f"- {d}/ ({n} files)\n" for d, n in sorted(dirs.items()))
+
+
+def build_retrieval_context(snapshot, prompt, cfg):
+    """
+    Project map plus the top-k chunks relevant to prompt, kept under
+    retrieval.token_budget. Returns (context_text, selected_chunks).
+    """
+    rcfg = cfg.get("retrieval", {})
+    top_k = rcfg.get("top_k", 12)
+    budget = rcfg.get("token_budget", 8000)
+
+    index = load_index(snapshot, cfg)
+    hits = index.search(prompt, top_k)
+
+    chosen = []
+    used = 0
+    for score, rel, start, end in hits:
+        text = snapshot.text(rel)
+        if text is None:
+            continue
+        body = "\n".join(text.split("\n")[start - 1:end])
+        cost = math.ceil(len(body) / 4)
+        if used + cost > budget:
+            continue
+        used += cost
+        chosen.append((rel, start, end, body))
+
+    chosen.sort(key=lambda c: (c[0], c[1]))
+
+    # overlapping windows of one file are shown as a single range
+    merged = []
+    for rel, start, end, body in chosen:
+        if merged and merged[-1][0] == rel and start <= merged[-1][2] + 1:
+            prev_rel, prev_start, prev_end, _ = merged[-1]
+            end = max(end, prev_end)
+            lines = snapshot.text(rel).split("\n")
+            merged[-1] = (rel, prev_start, end, "\n".join(lines[prev_start - 1:end]))
+        else:
+            merged.append((rel, start, end, body))
+    chosen = merged
+
+    parts = [
+        RETRIEVAL_MARKER + "\n",
+        "\nProject files:\n",
+        project_map(snapshot.files, rcfg.get("map_max_files", 400)),
+    ]
+
+    for rel, start, end, body in chosen:
+        parts.append(f"\nFile: {rel} (lines {start}-{end})\n```\n{body}\n```\n")
+
+    return "".join(parts), chosen
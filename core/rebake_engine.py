@@ -51,3 +51,97 @@ def compute_expiry(ttl_hours):
         datetime.now(timezone.utc)
         + timedelta(hours=ttl_hours)
     ).isoformat()
+
+
+# --------------------------------------------------------------
+# ECONOMIC PLANNER
+# --------------------------------------------------------------
+# Every option is priced over the same horizon: the cache's remaining
+# TTL (or a fresh TTL once it has expired), with the number of queries
+# expected from the observed rate.
+#
+#   keep    : storage(P) + Q * P * hit                (stale, tolerated)
+#   overlay : storage(P) + Q * (P * hit + D * input)
+#   rebake  : write(P)   + storage(P) + Q * P * hit
+#   drop    : Q * P * input                           (no cache at all)
+# --------------------------------------------------------------
+
+PLAN_OPTIONS = ("keep", "overlay", "rebake", "drop")
+
+
+def observed_query_rate(timestamps, now, window_hours=24):
+    """Queries per hour over the last window_hours (at least one hour)."""
+    cutoff = now - timedelta(hours=window_hours)
+    recent = sorted(t for t in timestamps if cutoff <= t <= now)
+    if not recent:
+        return 0.0
+    span = (now - recent[0]).total_seconds() / 3600
+    return len(recent) / max(1.0, span)
+
+
+def plan_costs(project_tokens, delta_tokens, query_rate, horizon_hours):
+    queries = query_rate * horizon_hours
+    per_m = 1_000_000
+
+    storage = estimate_cache_storage_cost(project_tokens, horizon_hours)
+    hit = project_tokens / per_m * CACHE_HIT_PER_M
+    full = project_tokens / per_m * STANDARD_INPUT_PER_M
+    delta = delta_tokens / per_m * STANDARD_INPUT_PER_M
+
+    return {
+        "keep": storage + queries * hit,
+        "overlay": storage + queries * (hit + delta),
+        "rebake": estimate_cache_write_cost(project_tokens) + storage + queries * hit,
+        "drop": queries * full,
+    }
+
+
+def plan_rebake(
+    project_tokens,
+    delta_tokens,
+    query_rate,
+    remaining_hours,
+    ttl_hours,
+    registry_expired,
+    keep_allowed,
+    overlay_allowed=True
+):
+    """
+    Cheapest of keep / overlay / rebake / drop.
+    Returns (choice, costs, explanation). Deterministic: ties resolve
+    in PLAN_OPTIONS order.
+    """
+    horizon = ttl_hours if registry_expired else max(remaining_hours, 0.0)
+    costs = plan_costs(project_tokens, delta_tokens, query_rate, horizon)
+
+    allowed = ["rebake", "drop"]
+    if not registry_expired:
+        if overlay_allowed:
+            allowed.append("overlay")
+        if keep_allowed:
+            allowed.append("keep")
+
+    choice = min(
+        (o for o in PLAN_OPTIONS if o in allowed),
+        key=lambda o: (round(costs[o], 9), PLAN_OPTIONS.index(o))
+    )
+
+    lines = [
+        f"horizon {horizon:.2f}h at {query_rate:.2f} queries/h "
+        f"≈ {query_rate * horizon:.1f} queries"
+    ]
+
+    # rebake beats overlay once the re-sent delta costs more than the write
+    if delta_tokens > 0 and horizon > 0:
+        q_rebake = project_tokens / (delta_tokens * horizon)
+        lines.append(f"rebake pays off above {q_rebake:.2f} queries/h")
+
+    # caching at all beats sending the project uncached
+    q_cache = CACHE_STORAGE_PER_M_PER_HR / (STANDARD_INPUT_PER_M - CACHE_HIT_PER_M)
+    lines.append(f"a cache pays off above {q_cache:.2f} queries/h")
+
+    lines.append("costs: " + ", ".join(
+        f"{o} ${costs[o]:.4f}" for o in PLAN_OPTIONS if o in allowed
+    ))
+
+    return choice, costs, "\n".join(lines)
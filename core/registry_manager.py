@@ -3,6 +3,8 @@ import os
 from datetime import datetime, timezone
 
 REG_PATH = ".zani/registry.json"
+QUERY_LOG_PATH = ".zani/queries.json"
+QUERY_LOG_MAX = 500
 
 
 class RegistryManager:
@@ -14,9 +16,12 @@ class RegistryManager:
             return json.load(f)
 
     def save(self, data: dict):
+        # write-then-rename so a background cache swap is atomic for readers
         os.makedirs(".zani", exist_ok=True)
-        with open(REG_PATH, "w", encoding="utf-8") as f:
+        tmp = REG_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2)
+        os.replace(tmp, REG_PATH)
 
     def clear(self):
         if os.path.exists(REG_PATH):
@@ -27,3 +32,23 @@ class RegistryManager:
         if not expiry:
             return False
         return datetime.now(timezone.utc).isoformat() > expiry
+
+    # ----------------------------------------------------------
+    # QUERY LOG (feeds the rebake planner's query rate)
+    # ----------------------------------------------------------
+
+    def load_query_times(self):
+        if not os.path.exists(QUERY_LOG_PATH):
+            return []
+        try:
+            with open(QUERY_LOG_PATH, "r", encoding="utf-8") as f:
+                return [datetime.fromisoformat(t) for t in json.load(f)]
+        except (OSError, ValueError):
+            return []
+
+    def record_query(self):
+        times = self.load_query_times()
+        times.append(datetime.now(timezone.utc))
+        os.makedirs(".zani", exist_ok=True)
+        with open(QUERY_LOG_PATH, "w", encoding="utf-8") as f:
+            json.dump([t.isoformat() for t in times[-QUERY_LOG_MAX:]], f)
@@ -0,0 +1,134 @@
+import os
+import re
+import json
+import time
+import hashlib
+
+CACHE_PATH = ".zani/response_cache.json"
+
+TTL_HOURS = 24
+MAX_ENTRIES = 200
+MAX_BYTES = 5_000_000
+
+
+# --------------------------------------------------------------
+# RESPONSE CACHE (CHAT ONLY, OPT-IN)
+# --------------------------------------------------------------
+# A chat answer is reused when the same question is asked against
+# the same context: workspace digest (all file digests from
+# scan_project), history digest (genesis, file updates and the
+# summary; plain chat turns are left out, as every ask appends its
+# own, so asking twice can hit), model, context mode and the
+# whitespace-normalised prompt.
+#
+# Entries are kept in least-recently-used order and evicted by age
+# (ttl_hours), count (max_entries) and total size (max_bytes).
+# --------------------------------------------------------------
+
+def workspace_digest(hashes):
+    h = hashlib.sha256()
+    for rel in sorted(hashes):
+        h.update(f"{rel}\0{hashes[rel]}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def history_digest(memory, history):
+    h = hashlib.sha256()
+    for record in history:
+        if memory.classify(record) == "summarizable":
+            continue
+        h.update(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def cache_key(workspace, history, model, context_mode, prompt):
+    raw = "\n".join((workspace, history, model, context_mode, normalize_prompt(prompt)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+
+    def __init__(self, cfg=None, path=CACHE_PATH):
+        rcfg = (cfg or {}).get("response_cache", {})
+        self.path = path
+        self.ttl = rcfg.get("ttl_hours", TTL_HOURS) * 3600
+        self.max_entries = rcfg.get("max_entries", MAX_ENTRIES)
+        self.max_bytes = rcfg.get("max_bytes", MAX_BYTES)
+
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        # dict order is the LRU order, oldest first
+        self.entries = data.get("entries", {})
+        self.hits = data.get("hits", 0)
+        self.misses = data.get("misses", 0)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": self.entries
+            }, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _evict(self, now):
+        for key in [k for k, e in self.entries.items() if now - e["created"] > self.ttl]:
+            del self.entries[key]
+
+        size = sum(e["bytes"] for e in self.entries.values())
+        while self.entries and (len(self.entries) > self.max_entries or size > self.max_bytes):
+            oldest = next(iter(self.entries))
+            size -= self.entries.pop(oldest)["bytes"]
+
+    # ----------------------------------------------------------
+    # LOOKUP / STORE
+    # ----------------------------------------------------------
+
+    def get(self, key):
+        """Cached answer or None; counts the hit or miss (a miss is saved by put)."""
+        now = time.time()
+        self._evict(now)
+
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        # re-insert as most recently used
+        self.entries[key] = entry
+        self.hits += 1
+        self._save()
+        return entry["text"]
+
+    def put(self, key, text):
+        now = time.time()
+        self.entries.pop(key, None)
+        self.entries[key] = {
+            "created": now,
+            "bytes": len(text.encode("utf-8")),
+            "text": text
+        }
+        self._evict(now)
+        self._save()
+
+    def clear(self):
+        self.entries = {}
+        self._save()
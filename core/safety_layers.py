@@ -1,14 +1,43 @@
 import os
 import yaml
 
+from core.ignore_rules import IgnoreRules
+
 class SafetyShield:
+    MACHINE_EXTENSIONS = frozenset({
+        '.pyc', '.pyo', '.exe', '.dll', '.so', '.dylib', '.o', '.a', '.bin',
+        '.class', '.jar', '.whl', '.png', '.jpg', '.jpeg', '.gif', '.webp',
+        '.ico', '.pdf', '.zip', '.gz', '.tar', '.7z', '.mp3', '.mp4',
+        '.woff', '.woff2', '.ttf', '.db', '.sqlite'
+    })
+
+    # known text: accepted without sniffing the content
+    TEXT_EXTENSIONS = frozenset({
+        '.py', '.js', '.jsx', '.ts', '.tsx', '.md', '.rst', '.txt', '.json',
+        '.yaml', '.yml', '.toml', '.ini', '.cfg', '.html', '.css', '.scss',
+        '.sh', '.go', '.rs', '.java', '.c', '.h', '.cpp', '.hpp', '.rb',
+        '.php', '.sql', '.xml', '.csv'
+    })
+
+    # Allow .zani internal files but ignore other hidden clutter
+    ALLOWED_DOTFILES = frozenset({'.env', '.gitignore', '.zani'})
+
+    SNIFF_BYTES = 8192
+
     def __init__(self):
         # Dynamically find the config file relative to this file's location
         base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.config_path = os.path.join(base_path, "config", "settings.yaml")
         self.config = self._load_config()
-        self.static_ignore = set(self.config.get('safety', {}).get('static_ignore', []))
-        self.max_size_kb = self.config.get('safety', {}).get('max_file_size_kb', 500)
+        safety = self.config.get('safety', {})
+        self.static_ignore = set(safety.get('static_ignore', []))
+        self.max_size_kb = safety.get('max_file_size_kb', 500)
+        self.respect_gitignore = safety.get('respect_gitignore', True)
+        self.walk_workers = safety.get('walk_workers', 4)
+
+        # static_ignore entries are gitignore patterns that cannot be negated
+        self._static = IgnoreRules(self.static_ignore)
+        self._layers = {}
 
     def _load_config(self):
         if not os.path.exists(self.config_path):
@@ -16,36 +45,146 @@ class SafetyShield:
         with open(self.config_path, 'r') as f:
             return yaml.safe_load(f)
 
-    def is_human_readable(self, file_path):
+    # ----------------------------------------------------------
+    # FILE CHECKS
+    # ----------------------------------------------------------
+
+    def is_binary(self, file_path):
         try:
-            file_size_kb = os.path.getsize(file_path) / 1024
-            if file_size_kb > self.max_size_kb:
-                return False
+            with open(file_path, 'rb') as f:
+                return b'\0' in f.read(self.SNIFF_BYTES)
         except OSError:
+            return True
+
+    def is_human_readable(self, file_path, st=None):
+        filename = os.path.basename(file_path)
+        if filename.startswith('.') and filename not in self.ALLOWED_DOTFILES:
             return False
 
-        machine_extensions = {'.pyc', '.exe', '.dll', '.so', '.o', '.bin', '.png', '.jpg', '.pdf', '.zip'}
-        if os.path.splitext(file_path)[1].lower() in machine_extensions:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext in self.MACHINE_EXTENSIONS:
             return False
 
-        filename = os.path.basename(file_path)
-        # Allow .zani internal files but ignore other hidden clutter
-        if filename.startswith('.') and filename not in ['.env', '.gitignore', '.zani']:
+        try:
+            size = st.st_size if st is not None else os.path.getsize(file_path)
+        except OSError:
+            return False
+        if size / 1024 > self.max_size_kb:
+            return False
+
+        if ext not in self.TEXT_EXTENSIONS and size and self.is_binary(file_path):
             return False
 
         return True
 
+    # ----------------------------------------------------------
+    # IGNORE MATCHING
+    # ----------------------------------------------------------
+
+    def _layer(self, root, rel_dir):
+        """Compiled .gitignore of root/rel_dir, or None."""
+        key = (root, rel_dir)
+        if key not in self._layers:
+            rules = None
+            if self.respect_gitignore:
+                rules = IgnoreRules.from_file(os.path.join(root, rel_dir, ".gitignore"))
+            self._layers[key] = rules or None
+        return self._layers[key]
+
+    def _match(self, rel, is_dir, layers):
+        """rel uses "/" separators; layers = [(base, rules)] root first."""
+        if self._static.match(rel, is_dir):
+            return True
+        for base, rules in reversed(layers):
+            sub = rel[len(base) + 1:] if base else rel
+            result = rules.match(sub, is_dir)
+            if result is not None:
+                return result
+        return False
+
+    def is_ignored(self, root, rel, is_dir=False):
+        """Full check for one path: its own rules and every ancestor directory."""
+        parts = rel.replace(os.sep, "/").split("/")
+        layers = []
+        base = ""
+
+        for i, name in enumerate(parts):
+            rules = self._layer(root, base)
+            if rules:
+                layers.append((base, rules))
+
+            path = f"{base}/{name}" if base else name
+            last = i == len(parts) - 1
+            if self._match(path, is_dir if last else True, layers):
+                return True
+            base = path
+
+        return False
+
+    def forget_ignore_rules(self):
+        self._layers.clear()
+
+    # ----------------------------------------------------------
+    # WALK
+    # ----------------------------------------------------------
+
+    def _walk(self, root, rel_dir, layers, out):
+        rules = self._layer(root, rel_dir)
+        if rules:
+            layers = layers + [(rel_dir, rules)]
+
+        subdirs = []
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as it:
+                entries = list(it)
+        except OSError:
+            return subdirs
+
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink() and not self._match(rel, True, layers):
+                        subdirs.append((rel, layers))
+                    continue
+                if not entry.is_file():
+                    continue
+                if self._match(rel, False, layers):
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+
+            if self.is_human_readable(entry.path, st):
+                out[rel] = st
+
+        return subdirs
+
+    def _walk_tree(self, root, rel_dir, layers):
+        out = {}
+        stack = [(rel_dir, layers)]
+        while stack:
+            stack.extend(self._walk(root, *stack.pop(), out))
+        return out
+
+    def scan_workspace_stats(self, root_path):
+        """{rel_path: stat_result} for every readable file, reusing scandir's stat."""
+        found = {}
+        top = self._walk(root_path, "", [], found)
+
+        if self.walk_workers > 1 and len(top) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=min(self.walk_workers, len(top))) as pool:
+                parts = list(pool.map(lambda d: self._walk_tree(root_path, *d), top))
+        else:
+            parts = [self._walk_tree(root_path, *d) for d in top]
+
+        for part in parts:
+            found.update(part)
+
+        if os.sep != "/":
+            found = {rel.replace("/", os.sep): st for rel, st in found.items()}
+        return found
+
     def scan_workspace(self, root_path):
-        human_files = []
-        for root, dirs, files in os.walk(root_path):
-            # Prune ignored directories
-            dirs[:] = [d for d in dirs if d not in self.static_ignore]
-
-            for file in files:
-                full_path = os.path.join(root, file)
-                rel_path = os.path.relpath(full_path, root_path)
-                
-                if self.is_human_readable(full_path):
-                    human_files.append(rel_path)
-        
-        return human_files
\ No newline at end of file
+        return list(self.scan_workspace_stats(root_path))
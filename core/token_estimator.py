@@ -0,0 +1,215 @@
+import os
+import json
+import math
+import time
+import threading
+
+MODEL_PATH = ".zani/token_model.json"
+
+# bytes per token before any calibration
+DEFAULT_RATIO = 4.0
+PRIOR_RATIOS = {
+    ".min.js": 2.8,
+    ".min.css": 2.8,
+    ".json": 3.2,
+    ".yaml": 3.4,
+    ".yml": 3.4,
+    ".md": 4.2,
+    ".txt": 4.2,
+    "utf8": 2.0,    # non-ASCII bytes, any file
+    "text": 4.0     # prompts, history, markers, system instruction
+}
+
+NON_ASCII_KEY = "utf8"
+TEXT_KEY = "text"
+
+LEARNING_RATE = 0.5
+MIN_RATIO = 1.0
+MAX_RATIO = 8.0
+MAX_CORRECTION = 4.0
+# a key must make up this share of an observation to count as a sample
+MIN_SHARE = 0.05
+LOG_MAX = 500
+
+_HIGH_BYTES = bytes(range(128, 256))
+
+
+# --------------------------------------------------------------
+# CALIBRATED TOKEN ESTIMATOR
+# --------------------------------------------------------------
+# Content is described as a profile, {key: bytes}, where the key is
+# the file extension (".py", ".min.js", ...), "utf8" for non-ASCII
+# bytes and "text" for everything that is not a file. Each key has
+# its own bytes-per-token ratio.
+#
+# Whenever the API reports the real token count for content whose
+# profile is known (explicit cache creation, first request of a
+# prompt), every key involved is corrected in proportion to its share
+# of the estimate, and the error is logged for `zani tokens`.
+# --------------------------------------------------------------
+
+def ratio_key(rel):
+    name = os.path.basename(rel).lower()
+    for compound in (".min.js", ".min.css"):
+        if name.endswith(compound):
+            return compound
+    return os.path.splitext(name)[1] or "none"
+
+
+def count_non_ascii(data: bytes) -> int:
+    return len(data) - len(data.translate(None, _HIGH_BYTES))
+
+
+def add_profile(total, profile):
+    for key, n in profile.items():
+        total[key] = total.get(key, 0) + n
+    return total
+
+
+class TokenEstimator:
+
+    def __init__(self, root=".", cfg=None):
+        tcfg = (cfg or {}).get("token_estimator", {})
+        self.path = os.path.join(root, MODEL_PATH)
+        self.learning_rate = tcfg.get("learning_rate", LEARNING_RATE)
+        self.calibrate = tcfg.get("calibrate", True)
+        self.ratios = {}
+        self.samples = {}
+        self.log = []
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.load()
+
+    # ----------------------------------------------------------
+    # PERSISTENCE
+    # ----------------------------------------------------------
+
+    def load(self):
+        try:
+            self._mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.ratios = data.get("ratios", {})
+        self.samples = data.get("samples", {})
+        self.log = data.get("log", [])
+
+    def reload(self):
+        """Pick up ratios learned by another process (the watcher is long-lived)."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.load()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "ratios": self.ratios,
+                "samples": self.samples,
+                "log": self.log[-LOG_MAX:]
+            }, f, indent=2)
+        os.replace(tmp, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    # ----------------------------------------------------------
+    # ESTIMATES
+    # ----------------------------------------------------------
+
+    def ratio(self, key):
+        return self.ratios.get(key, PRIOR_RATIOS.get(key, DEFAULT_RATIO))
+
+    def file_profile(self, rel, size, non_ascii=0):
+        profile = {ratio_key(rel): size - non_ascii}
+        if non_ascii:
+            profile[NON_ASCII_KEY] = non_ascii
+        return profile
+
+    def text_profile(self, text):
+        data = text.encode("utf-8")
+        non_ascii = count_non_ascii(data)
+        profile = {TEXT_KEY: len(data) - non_ascii}
+        if non_ascii:
+            profile[NON_ASCII_KEY] = non_ascii
+        return profile
+
+    def estimate(self, profile) -> int:
+        return int(sum(n / self.ratio(key) for key, n in profile.items()))
+
+    def file_tokens(self, rel, size, non_ascii=0) -> int:
+        return self.estimate(self.file_profile(rel, size, non_ascii))
+
+    def text_tokens(self, text) -> int:
+        return self.estimate(self.text_profile(text))
+
+    # ----------------------------------------------------------
+    # CALIBRATION
+    # ----------------------------------------------------------
+
+    def observe(self, profile, actual, source):
+        """
+        Record the real token count for a profile and move every key
+        toward it. Returns the estimate made before the update, or
+        None when there is nothing to learn from.
+        """
+        profile = {k: n for k, n in profile.items() if n > 0}
+        if not actual or not profile:
+            return None
+        if not self.calibrate:
+            return self.estimate(profile)
+
+        with self._lock:
+            self.reload()
+            parts = {k: n / self.ratio(k) for k, n in profile.items()}
+            estimated = sum(parts.values())
+            if estimated <= 0:
+                return None
+
+            correction = min(MAX_CORRECTION, max(1 / MAX_CORRECTION, actual / estimated))
+            step = math.log(correction) * self.learning_rate
+
+            for key, part in parts.items():
+                share = part / estimated
+                # more tokens than estimated -> fewer bytes per token
+                ratio = self.ratio(key) * math.exp(-step * share)
+                self.ratios[key] = round(min(MAX_RATIO, max(MIN_RATIO, ratio)), 4)
+                if share >= MIN_SHARE:
+                    self.samples[key] = self.samples.get(key, 0) + 1
+
+            self.log.append({
+                "time": int(time.time()),
+                "source": source,
+                "estimated": int(estimated),
+                "actual": int(actual)
+            })
+            self.save()
+
+        return int(estimated)
+
+    # ----------------------------------------------------------
+    # REPORT
+    # ----------------------------------------------------------
+
+    def error_report(self, recent=10):
+        """
+        [(source, n, mean_abs_error_pct, first_pct, recent_pct)], where
+        first/recent are the mean absolute error of the oldest and the
+        newest `recent` observations of that source.
+        """
+        def mape(rows):
+            if not rows:
+                return None
+            return 100 * sum(abs(r["estimated"] - r["actual"]) / r["actual"] for r in rows) / len(rows)
+
+        by_source = {}
+        for row in self.log:
+            by_source.setdefault(row["source"], []).append(row)
+
+        return [
+            (source, len(rows), mape(rows), mape(rows[:recent]), mape(rows[-recent:]))
+            for source, rows in sorted(by_source.items())
+        ]
@@ -1,4 +1,46 @@
 import os
+import re
+import stat
+
+from tools.file_ops import FILE_OPS, note_written
+
+# ==============================================================
+# ATOMIC WRITES
+# ==============================================================
+# Content goes to a temp file in the target's directory, is synced,
+# and then renamed over the target, so a file is always either the
+# old or the new version, never half written. Symlinks are resolved
+# first (the link's target is written, the link stays) and the temp
+# file takes over the permission bits of the file it replaces.
+# ==============================================================
+
+def _copy_mode(src, dst):
+    try:
+        os.chmod(dst, stat.S_IMODE(os.stat(src).st_mode))
+    except FileNotFoundError:
+        pass
+
+
+def _stage(path: str, content: str) -> str:
+    """Temp file next to path (already resolved with realpath)."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    tmp = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.zani-tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    _copy_mode(path, tmp)
+    return tmp
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
 
 def write_to_file(filename: str, content: str) -> str:
     """
@@ -6,16 +48,289 @@ def write_to_file(filename: str, content: str) -> str:
     Returns a success or error message.
     """
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
-        
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(content)
+        path = os.path.realpath(filename)
+        os.replace(_stage(path, content), path)
+        note_written([path])
         return f"✅ Successfully wrote to {filename}"
     except Exception as e:
         return f"❌ Failed to write {filename}: {str(e)}"
 
+
+def apply_writes(writes, workers=8):
+    """
+    Apply [(filename, content)] as one transaction.
+
+    All files are staged concurrently first; nothing is touched if any
+    staging fails. Renames then happen in order, and a failing rename
+    restores every file already replaced (or removes it if it was new).
+    Returns (ok, [message per write]).
+    """
+    if not writes:
+        return True, []
+
+    # later writes to the same file win; stage each target once
+    final = {}
+    for filename, content in writes:
+        path = os.path.realpath(filename)
+        final[path] = (filename, path, content)
+    targets = list(final.values())
+
+    def _one(item):
+        _, path, content = item
+        try:
+            return _stage(path, content), None
+        except Exception as e:
+            return None, e
+
+    if workers > 1 and len(targets) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(workers, len(targets))) as pool:
+            staged = list(pool.map(_one, targets))
+    else:
+        staged = [_one(t) for t in targets]
+
+    failed = {t[0]: e for t, (_, e) in zip(targets, staged) if e is not None}
+    if failed:
+        for tmp, _ in staged:
+            if tmp:
+                _discard(tmp)
+        return False, [
+            f"❌ Failed to write {name}: {failed[name]}" if name in failed
+            else f"⏸ Not written {name} (batch aborted)"
+            for name, _ in writes
+        ]
+
+    # originals are kept in memory for rollback
+    backups = []
+    done = []
+    error = None
+
+    for (filename, path, _), (tmp, _) in zip(targets, staged):
+        try:
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    backups.append((path, f.read()))
+            else:
+                backups.append((path, None))
+            os.replace(tmp, path)
+            done.append(path)
+        except Exception as e:
+            error = (filename, e)
+            break
+
+    # rolled-back files are checked on disk as well
+    note_written(done)
+
+    if error is None:
+        return True, [f"✅ Successfully wrote to {name}" for name, _ in writes]
+
+    for tmp, _ in staged:
+        if tmp and os.path.exists(tmp):
+            _discard(tmp)
+
+    for path, original in reversed(backups[:len(done)]):
+        if original is None:
+            _discard(path)
+            continue
+        tmp = path + ".zani-rollback"
+        with open(tmp, "wb") as f:
+            f.write(original)
+        _copy_mode(path, tmp)
+        os.replace(tmp, path)
+
+    bad, exc = error
+    return False, [
+        f"❌ Failed to write {name}: {exc}" if name == bad
+        else f"↩ Rolled back {name}"
+        for name, _ in writes
+    ]
+
+
+# ==============================================================
+# PATCH-BASED EDITS
+# ==============================================================
+# The model sends only the lines that change. Every edit is checked
+# against the current content and rejected unless it applies
+# cleanly; nothing is written for a rejected edit.
+# ==============================================================
+
+class PatchError(Exception):
+    pass
+
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def _split(text):
+    """(lines, newline, trailing_newline) keeping the file's line endings."""
+    newline = "\r\n" if "\r\n" in text else "\n"
+    trailing = text.endswith(newline)
+    body = text[:-len(newline)] if trailing else text
+    lines = body.split(newline) if body else []
+    return lines, newline, trailing
+
+
+def _join(lines, newline, trailing):
+    if not lines:
+        return ""
+    return newline.join(lines) + (newline if trailing else "")
+
+
+def parse_unified_diff(patch):
+    """[(old_start or None, old_lines, new_lines)] for every hunk."""
+    hunks = []
+    current = None
+
+    for line in patch.splitlines():
+        if line.startswith("@@"):
+            m = HUNK_HEADER.match(line)
+            current = (int(m.group(1)) if m else None, [], [])
+            hunks.append(current)
+            continue
+        if current is None:
+            continue  # ---/+++ headers and anything before the first hunk
+        if line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+
+        tag, text = (line[0], line[1:]) if line else (" ", "")
+        if tag == " ":
+            current[1].append(text)
+            current[2].append(text)
+        elif tag == "-":
+            current[1].append(text)
+        elif tag == "+":
+            current[2].append(text)
+        else:
+            raise PatchError(f"unexpected line in hunk: {line!r}")
+
+    if not hunks:
+        raise PatchError("no @@ hunks found in patch")
+    return hunks
+
+
+def _find(lines, old, start, hint):
+    """Index where old matches lines at or after start, nearest to hint."""
+    last = len(lines) - len(old)
+    candidates = [i for i in range(start, last + 1) if lines[i:i + len(old)] == old]
+
+    if not candidates:
+        # tolerate trailing whitespace differences, nothing else
+        stripped = [l.rstrip() for l in old]
+        candidates = [
+            i for i in range(start, last + 1)
+            if [l.rstrip() for l in lines[i:i + len(old)]] == stripped
+        ]
+
+    if not candidates:
+        return None
+    return min(candidates, key=lambda i: abs(i - hint))
+
+
+def patch_text(original, patch):
+    lines, newline, trailing = _split(original or "")
+    if original is None:
+        trailing = True
+
+    delta = 0
+    floor = 0
+
+    for n, (old_start, old, new) in enumerate(parse_unified_diff(patch), 1):
+        hint = (old_start - 1 if old_start else floor) + delta
+
+        if not old:
+            # pure insertion: "-k,0" means after line k
+            idx = (old_start or 0) + delta if old_start is not None else len(lines)
+            idx = max(floor, min(idx, len(lines)))
+        else:
+            idx = _find(lines, old, floor, max(hint, floor))
+            if idx is None:
+                where = f" near line {old_start}" if old_start else ""
+                raise PatchError(f"hunk {n} does not apply: context not found{where}")
+
+        lines[idx:idx + len(old)] = new
+        delta += len(new) - len(old)
+        floor = idx + len(new)
+
+    return _join(lines, newline, trailing or not original)
+
+
+def replace_text(original, old_text, new_text, start_line=None):
+    if original is None:
+        raise PatchError("file does not exist")
+    if not old_text:
+        raise PatchError("old_text must not be empty")
+
+    matches = [m.start() for m in re.finditer(re.escape(old_text), original)]
+    if not matches:
+        raise PatchError("old_text not found in file")
+
+    if len(matches) > 1:
+        if start_line is None:
+            raise PatchError(
+                f"old_text matches {len(matches)} times; "
+                "add surrounding lines or pass start_line"
+            )
+        line_of = lambda pos: original.count("\n", 0, pos) + 1
+        matches.sort(key=lambda pos: abs(line_of(pos) - start_line))
+
+    pos = matches[0]
+    return original[:pos] + new_text + original[pos + len(old_text):]
+
+
+def read_current(filename):
+    try:
+        with open(filename, "r", encoding="utf-8", newline="") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _edit_write(current, filename, content):
+    return content
+
+
+def _edit_patch(current, filename, patch):
+    return patch_text(current, patch)
+
+
+def _edit_replace(current, filename, old_text, new_text, start_line=None):
+    return replace_text(current, old_text, new_text, start_line)
+
+
+# Tools that edit one file: name -> fn(current_text, **args) -> new text.
+# The batch executor uses these to plan all edits before writing any.
+FILE_EDITS = {
+    "write_to_file": _edit_write,
+    "apply_patch": _edit_patch,
+    "replace_range": _edit_replace,
+}
+
+
+def _apply_edit(name, filename, **args):
+    try:
+        content = FILE_EDITS[name](read_current(filename), filename, **args)
+    except PatchError as e:
+        return f"❌ {name} rejected for {filename}: {e}"
+    return write_to_file(filename, content)
+
+
+def apply_patch(filename: str, patch: str) -> str:
+    """Apply a unified diff to one file if every hunk applies cleanly."""
+    return _apply_edit("apply_patch", filename, patch=patch)
+
+
+def replace_range(filename: str, old_text: str, new_text: str, start_line=None) -> str:
+    """Replace one exact occurrence of old_text (nearest to start_line if ambiguous)."""
+    return _apply_edit(
+        "replace_range", filename,
+        old_text=old_text, new_text=new_text, start_line=start_line
+    )
+
+
 # A dictionary mapping tool names to their actual functions for the dispatcher
 AVAILABLE_TOOLS = {
-    "write_to_file": write_to_file
-}
\ No newline at end of file
+    "write_to_file": write_to_file,
+    "apply_patch": apply_patch,
+    "replace_range": replace_range,
+    **FILE_OPS
+}
@@ -1,36 +1,154 @@
 import os
-from PIL import Image
+import sys
 
 
 # ==========================================================
-# ANSI IMAGE RENDERER (YOUR SCRIPT — UNTOUCHED)
+# ANSI IMAGE RENDERER
+# ==========================================================
+# Each asset is rendered once per (width, colour depth, mtime)
+# from the raw pixel buffer and kept under .zani/art/. Later calls
+# just replay the cached escape sequence with a single write.
 # ==========================================================
 
-def render_logo(image_path, width=60):
-    try:
-        img = Image.open(image_path).convert("RGB")
-    except Exception as e:
-        print(f"Error: {e}")
-        return
+ART_CACHE_DIR = ".zani/art"
+HALF_BLOCK = "\u2580"
+RESET = "\033[0m"
+
+
+# terminals known not to handle 24-bit escapes
+LIMITED_TERMS = ("linux", "vt100", "vt220", "ansi", "dumb")
+
+# "truecolor" / "256" from ui.color_depth; None = detect
+_depth_override = None
+
+
+def set_color_depth(depth):
+    global _depth_override
+    _depth_override = depth if depth in ("truecolor", "256") else None
+
+
+def color_depth():
+    """Truecolor unless configured otherwise or TERM says it cannot work."""
+    if _depth_override:
+        return _depth_override
+    term = os.environ.get("TERM", "").lower()
+    if term in LIMITED_TERMS:
+        return "256"
+    return "truecolor"
+
+
+def _pixels(image_path, width):
+    """(rows, width) arrays of packed 0xRRGGBB for top and bottom halves."""
+    import numpy as np
+    from PIL import Image
+
+    img = Image.open(image_path).convert("RGB")
 
     original_width, original_height = img.size
-    aspect_ratio = original_height / original_width
-    height = int(width * aspect_ratio)
+    height = int(width * original_height / original_width)
+    height -= height % 2
     img = img.resize((width, height))
 
-    reset = "\033[0m"
+    rgb = np.frombuffer(img.tobytes(), dtype=np.uint8).reshape(height, width, 3)
+    rgb = rgb.astype(np.uint32)
+    packed = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    return packed[0::2], packed[1::2]
+
+
+def _to_xterm256(packed):
+    """Map packed RGB to the 6x6x6 colour cube of the 256 palette."""
+    r = (packed >> 16) & 0xFF
+    g = (packed >> 8) & 0xFF
+    b = packed & 0xFF
+    return 16 + 36 * ((r * 5 + 127) // 255) + 6 * ((g * 5 + 127) // 255) + (b * 5 + 127) // 255
+
+
+def _ansi_tables(depth):
+    if depth == "256":
+        fg = lambda c: f"\033[38;5;{c}m"
+        bg = lambda c: f"\033[48;5;{c}m"
+    else:
+        fg = lambda c: f"\033[38;2;{c >> 16};{(c >> 8) & 0xFF};{c & 0xFF}m"
+        bg = lambda c: f"\033[48;2;{c >> 16};{(c >> 8) & 0xFF};{c & 0xFF}m"
+    return fg, bg
+
+
+def encode_ansi(top, bottom, depth):
+    if depth == "256":
+        top, bottom = _to_xterm256(top), _to_xterm256(bottom)
+    fg, bg = _ansi_tables(depth)
 
-    for y in range(0, height - 1, 2):
-        line = ""
-        for x in range(width):
-            top_rgb = img.getpixel((x, y))
-            bottom_rgb = img.getpixel((x, y + 1))
+    out = []
+    for top_row, bottom_row in zip(top.tolist(), bottom.tolist()):
+        last_fg = last_bg = None
+        for t, b in zip(top_row, bottom_row):
+            # only emit a colour when it differs from the previous cell
+            if t != last_fg:
+                out.append(fg(t))
+                last_fg = t
+            if b != last_bg:
+                out.append(bg(b))
+                last_bg = b
+            out.append(HALF_BLOCK)
+        out.append(RESET + "\n")
 
-            line += f"\033[38;2;{top_rgb[0]};{top_rgb[1]};{top_rgb[2]}m"
-            line += f"\033[48;2;{bottom_rgb[0]};{bottom_rgb[1]};{bottom_rgb[2]}m"
-            line += "▀"
+    return "".join(out)
+
+
+def _cache_path(image_path, width, depth, mtime_ns):
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(ART_CACHE_DIR, f"{stem}.{width}.{depth}.{mtime_ns}.ans")
+
+
+def _store(path, art):
+    os.makedirs(ART_CACHE_DIR, exist_ok=True)
+
+    # drop renders of an older version of the same asset; other widths
+    # and colour depths of this version stay cached
+    stem, _, _, mtime = os.path.basename(path)[:-len(".ans")].rsplit(".", 3)
+    for name in os.listdir(ART_CACHE_DIR):
+        if not name.endswith(".ans"):
+            continue
+        parts = name[:-len(".ans")].rsplit(".", 3)
+        if len(parts) == 4 and parts[0] == stem and parts[3] != mtime:
+            os.remove(os.path.join(ART_CACHE_DIR, name))
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(art)
+    os.replace(tmp, path)
+
+
+def load_art(image_path, width=60, depth=None):
+    depth = depth or color_depth()
+    path = _cache_path(image_path, width, depth, os.stat(image_path).st_mtime_ns)
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        pass
+
+    art = encode_ansi(*_pixels(image_path, width), depth)
+    try:
+        _store(path, art)
+    except OSError:
+        pass
+    return art
+
+
+def render_logo(image_path, width=60):
+    if not sys.stdout.isatty():
+        return
+
+    try:
+        art = load_art(image_path, width)
+    except Exception as e:
+        print(f"Error: {e}")
+        return
 
-        print(line + reset)
+    sys.stdout.write(art)
+    sys.stdout.flush()
 
 
 # ==========================================================
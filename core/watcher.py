@@ -0,0 +1,546 @@
+import os
+import json
+import stat
+import time
+import errno
+import select
+import signal
+import struct
+
+from core.safety_layers import SafetyShield
+from core.token_estimator import TokenEstimator
+from core.project_state import (
+    scan_project,
+    digest_files,
+    load_manifest,
+    save_manifest,
+    manifest_entry,
+    _stat_matches,
+    MANIFEST_VERSION,
+    DEFAULT_ALGORITHM
+)
+
+WATCH_STATE_PATH = ".zani/watch_state.json"
+# readers drop a token here; the inotify watcher acknowledges it in
+# watch_state.json once every event queued before it is applied
+SYNC_DIR = ".zani/sync"
+SYNC_PATH = os.path.join(SYNC_DIR, "request")
+
+HEARTBEAT_SECONDS = 2.0
+STALE_AFTER_SECONDS = 10.0
+POLL_INTERVAL = 1.0
+DEBOUNCE_MS = 100
+
+# how long a reader waits for a busy watcher before scanning itself
+SETTLE_TIMEOUT = 1.0
+
+
+# --------------------------------------------------------------
+# INOTIFY (ctypes, Linux only)
+# --------------------------------------------------------------
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self._ctypes = ctypes
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.dirs = {}   # wd -> directory relative to root ("" for root)
+
+    def add(self, full, rel):
+        wd = self._libc.inotify_add_watch(self.fd, full.encode(), WATCH_MASK)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return
+            raise OSError(err, f"inotify_add_watch failed for {full}")
+        self.dirs[wd] = rel
+
+    def forget(self, rel_dir):
+        """Drop the mapping of a directory that was moved or deleted."""
+        prefix = rel_dir + os.sep
+        for wd, rel in list(self.dirs.items()):
+            if rel == rel_dir or rel.startswith(prefix):
+                del self.dirs[wd]
+
+    def read(self, timeout):
+        """[(mask, rel_path)] for events available within timeout."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = data[pos:pos + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            pos += length
+
+            if mask & IN_Q_OVERFLOW:
+                events.append((mask, None))
+                continue
+
+            base = self.dirs.get(wd)
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            if base is None:
+                continue
+
+            events.append((mask, os.path.join(base, name) if name else base))
+
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+# --------------------------------------------------------------
+# WATCHER
+# --------------------------------------------------------------
+# Keeps .zani/manifest.json current while it runs. Every event
+# batch only stats and rehashes the paths it names, so the cost of
+# staying current is O(changes). A heartbeat in watch_state.json
+# tells `zani chat/act` that the manifest can be used as-is.
+# --------------------------------------------------------------
+
+class WorkspaceWatcher:
+
+    def __init__(self, root, cfg):
+        self.root = root
+        self.cfg = cfg
+
+        wcfg = cfg.get("watcher", {})
+        self.heartbeat = wcfg.get("heartbeat_seconds", HEARTBEAT_SECONDS)
+        self.poll_interval = wcfg.get("poll_interval", POLL_INTERVAL)
+        self.debounce = wcfg.get("debounce_ms", DEBOUNCE_MS) / 1000
+        self.backend = wcfg.get("backend", "auto")
+
+        hashing = cfg.get("hashing", {})
+        self.algorithm = hashing.get("algorithm", DEFAULT_ALGORITHM)
+        self.workers = hashing.get("workers")
+
+        self.shield = SafetyShield()
+        self.estimator = TokenEstimator(root, cfg)
+        self.entries = {}
+        self.scanned_at_ns = 0
+        self.started = time.time()
+        self._running = False
+        self._last_beat = 0.0
+        # poll backend: wall time at which the last completed sweep began
+        self.swept_at = None
+        # inotify backend: newest reader token whose events are applied
+        self.synced_ns = None
+
+    # ----------------------------------------------------------
+    # FILTERING
+    # ----------------------------------------------------------
+
+    def _ignored_dir(self, rel):
+        return rel.split(os.sep)[0] == ".zani" or self.shield.is_ignored(self.root, rel, is_dir=True)
+
+    def _allowed(self, rel):
+        if rel.startswith(".zani") or self.shield.is_ignored(self.root, rel):
+            return False
+        return self.shield.is_human_readable(os.path.join(self.root, rel))
+
+    # ----------------------------------------------------------
+    # SCANNING
+    # ----------------------------------------------------------
+
+    def full_scan(self):
+        files = [f for f in self.shield.scan_workspace(self.root) if not f.startswith(".zani")]
+        scan_project(
+            self.root,
+            files,
+            algorithm=self.algorithm,
+            workers=self.workers,
+            estimator=self.estimator
+        )
+        manifest = load_manifest(self.root)
+        self.entries = manifest.get("files", {})
+        self.scanned_at_ns = manifest.get("scanned_at_ns", 0)
+
+    def refresh(self, paths, started_ns):
+        """
+        Re-stat the given relative paths and rehash the ones whose stat
+        tuple changed. Returns True when the manifest changed.
+        """
+        stale = {}
+        changed = False
+
+        for rel in paths:
+            if not self._allowed(rel):
+                changed |= self.entries.pop(rel, None) is not None
+                continue
+            try:
+                st = os.stat(os.path.join(self.root, rel))
+            except OSError:
+                st = None
+            if st is None or not stat.S_ISREG(st.st_mode):
+                changed |= self.entries.pop(rel, None) is not None
+                continue
+
+            # same racy-clean rule as scan_project: a write in the same
+            # mtime tick as the last hash leaves the stat tuple unchanged
+            if _stat_matches(self.entries.get(rel), st, self.scanned_at_ns):
+                continue
+            stale[rel] = st
+
+        if stale:
+            digests = digest_files(
+                [os.path.join(self.root, rel) for rel in stale],
+                self.algorithm,
+                self.workers
+            )
+            self.estimator.reload()
+            for rel, st in stale.items():
+                found = digests.get(os.path.join(self.root, rel))
+                if found is None:
+                    self.entries.pop(rel, None)
+                    continue
+                self.entries[rel] = manifest_entry(rel, st, *found, self.estimator)
+            changed = True
+
+        if changed:
+            # every write before started_ns was drained into this batch,
+            # so only later mtimes can be racy
+            self.scanned_at_ns = started_ns
+            save_manifest(self.root, {
+                "version": MANIFEST_VERSION,
+                "algorithm": self.algorithm,
+                "scanned_at_ns": self.scanned_at_ns,
+                "project_tokens": sum(e["tokens"] for e in self.entries.values()),
+                "files": self.entries
+            })
+
+        return changed
+
+    def _under(self, rel_dir):
+        prefix = rel_dir + os.sep
+        return [f for f in self.entries if f.startswith(prefix)]
+
+    def _subtree(self, rel_dir):
+        found = self.shield.scan_workspace(os.path.join(self.root, rel_dir))
+        return [os.path.join(rel_dir, f) for f in found]
+
+    # ----------------------------------------------------------
+    # STATE / HEARTBEAT
+    # ----------------------------------------------------------
+
+    def write_state(self, busy=False, force=False):
+        now = time.time()
+        if not force and not busy and now - self._last_beat < self.heartbeat:
+            return
+        self._last_beat = now
+
+        path = os.path.join(self.root, WATCH_STATE_PATH)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "pid": os.getpid(),
+                "root": os.path.abspath(self.root),
+                "backend": self.backend,
+                "algorithm": self.algorithm,
+                "started": self.started,
+                "heartbeat": now,
+                "busy": busy,
+                "swept_at": self.swept_at,
+                "synced_ns": self.synced_ns,
+                "files": len(self.entries)
+            }, f)
+        os.replace(tmp, path)
+
+    def clear_state(self):
+        path = os.path.join(self.root, WATCH_STATE_PATH)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if json.load(f).get("pid") != os.getpid():
+                    return
+            os.remove(path)
+        except (OSError, ValueError):
+            pass
+
+    # ----------------------------------------------------------
+    # RUN
+    # ----------------------------------------------------------
+
+    def stop(self, *_):
+        self._running = False
+
+    def run(self, on_change=None):
+        signal.signal(signal.SIGTERM, self.stop)
+        self._running = True
+
+        self.full_scan()
+
+        inotify = None
+        if self.backend in ("auto", "inotify"):
+            try:
+                inotify = self._start_inotify()
+                self.backend = "inotify"
+            except (OSError, AttributeError):
+                if self.backend == "inotify":
+                    raise
+        if inotify is None:
+            self.backend = "poll"
+
+        self.write_state(force=True)
+
+        try:
+            if inotify:
+                self._loop_inotify(inotify, on_change)
+            else:
+                self._loop_poll(on_change)
+        finally:
+            if inotify:
+                inotify.close()
+            self.clear_state()
+
+    def _start_inotify(self):
+        inotify = Inotify()
+        self._watch_tree(inotify, "")
+        sync_dir = os.path.join(self.root, SYNC_DIR)
+        os.makedirs(sync_dir, exist_ok=True)
+        inotify.add(sync_dir, SYNC_DIR)
+        return inotify
+
+    def _read_sync(self):
+        try:
+            with open(os.path.join(self.root, SYNC_PATH), "r", encoding="utf-8") as f:
+                token = int(f.read().strip())
+        except (OSError, ValueError):
+            return
+        self.synced_ns = max(self.synced_ns or 0, token)
+
+    def _watch_tree(self, inotify, rel_dir):
+        # re-adding a watched directory only refreshes its wd mapping
+        for root, dirs, _ in os.walk(os.path.join(self.root, rel_dir)):
+            rel = os.path.relpath(root, self.root)
+            rel = "" if rel == "." else rel
+            dirs[:] = [
+                d for d in dirs
+                if not self._ignored_dir(os.path.join(rel, d) if rel else d)
+            ]
+            inotify.add(root, rel)
+
+    def _split_sync(self, events):
+        """(workspace events, whether a reader asked for a sync)."""
+        prefix = SYNC_DIR + os.sep
+        rest = [(mask, rel) for mask, rel in events if rel is None or not (rel + os.sep).startswith(prefix)]
+        return rest, len(rest) < len(events)
+
+    def _loop_inotify(self, inotify, on_change):
+        while self._running:
+            events, sync = self._split_sync(inotify.read(self.heartbeat))
+            if not events:
+                if sync:
+                    # the queue is ordered: earlier events are already applied
+                    self._read_sync()
+                    self.write_state(force=True)
+                else:
+                    self.write_state()
+                continue
+
+            self.write_state(busy=True)
+
+            # let a burst of writes (save, format, git checkout) settle
+            time.sleep(self.debounce)
+            started_ns = time.time_ns()
+            more, late_sync = self._split_sync(inotify.read(0))
+            events += more
+            sync |= late_sync
+
+            dirty = set()
+            rescan = False
+
+            for mask, rel in events:
+                if rel is None:
+                    rescan = True
+                    continue
+                if mask & IN_ISDIR:
+                    if self._ignored_dir(rel):
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._watch_tree(inotify, rel)
+                        dirty.update(self._subtree(rel))
+                    if mask & (IN_DELETE | IN_MOVED_FROM):
+                        inotify.forget(rel)
+                        dirty.update(self._under(rel))
+                elif os.path.basename(rel) == ".gitignore":
+                    # ignore rules changed: what is in the workspace may too
+                    self.shield.forget_ignore_rules()
+                    rescan = True
+                elif rel:
+                    dirty.add(rel)
+
+            if rescan:
+                self.full_scan()
+                self._watch_tree(inotify, "")
+                changed = True
+            else:
+                changed = self.refresh(dirty, started_ns)
+
+            if sync:
+                self._read_sync()
+            self.write_state(force=True)
+            if changed and on_change:
+                on_change(len(self.entries))
+
+    def _loop_poll(self, on_change):
+        # stat-only sweep: unchanged files are never reopened. A poll
+        # manifest can lag an edit by a whole interval, so readers only
+        # trust it once a sweep has started after they did (swept_at).
+        self.swept_at = time.time()
+        while self._running:
+            time.sleep(self.poll_interval)
+            self.write_state(busy=True)
+            started_ns = time.time_ns()
+            self.shield.forget_ignore_rules()
+
+            files = set(f for f in self.shield.scan_workspace(self.root) if not f.startswith(".zani"))
+            changed = self.refresh(files | set(self.entries), started_ns)
+
+            self.swept_at = started_ns / 1e9
+            self.write_state(force=True)
+            if changed and on_change:
+                on_change(len(self.entries))
+
+
+# --------------------------------------------------------------
+# READER SIDE
+# --------------------------------------------------------------
+
+def load_watch_state(root):
+    path = os.path.join(root, WATCH_STATE_PATH)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def watcher_alive(root):
+    state = load_watch_state(root)
+    if not state or not _alive(state.get("pid", -1)):
+        return None
+    return state
+
+
+def watched_manifest(root, cfg, algorithm):
+    """
+    The manifest kept by a live watcher, or None when the caller has
+    to scan the tree itself (no watcher, stale heartbeat, different
+    algorithm, or not caught up after SETTLE_TIMEOUT). Edits made just
+    before this call may not have been applied yet, so the manifest is
+    only used once the watcher has caught up with them: an inotify
+    watcher acknowledges a sync token written here, a poll watcher must
+    have started a sweep after this call.
+    """
+    wcfg = cfg.get("watcher", {})
+    if not wcfg.get("enabled", True):
+        return None
+
+    stale_after = wcfg.get("stale_after_seconds", STALE_AFTER_SECONDS)
+    requested = time.time()
+    deadline = requested + SETTLE_TIMEOUT
+    token = None
+
+    while True:
+        state = watcher_alive(root)
+        if not state or state.get("algorithm") != algorithm:
+            return None
+        if time.time() - state.get("heartbeat", 0) > stale_after:
+            return None
+        swept = True
+        if state.get("backend") == "inotify":
+            if token is None:
+                token = request_sync(root)
+                if token is None:
+                    return None
+            swept = (state.get("synced_ns") or 0) >= token
+        elif state.get("backend") == "poll":
+            swept = (state.get("swept_at") or 0) >= requested
+            # waiting out one interval is still cheaper than a walk
+            deadline = max(deadline, requested + wcfg.get("poll_interval", POLL_INTERVAL) + SETTLE_TIMEOUT)
+        if swept and not state.get("busy"):
+            break
+        if time.time() > deadline:
+            return None
+        time.sleep(0.01)
+
+    manifest = load_manifest(root)
+    if manifest.get("algorithm", DEFAULT_ALGORITHM) != algorithm:
+        return None
+    return manifest
+
+
+def request_sync(root):
+    """Write a sync token (wall time in ns) for the watcher, or None."""
+    token = time.time_ns()
+    path = os.path.join(root, SYNC_PATH)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(token))
+        os.replace(tmp, path)
+    except OSError:
+        return None
+    return token
+
+
+def stop_watcher(root):
+    state = watcher_alive(root)
+    if not state:
+        return False
+    os.kill(state["pid"], signal.SIGTERM)
+    return True
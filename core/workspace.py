@@ -0,0 +1,186 @@
+import os
+
+from core.safety_layers import SafetyShield
+from core.memory import GENESIS_MARKER
+from core.token_estimator import TokenEstimator, add_profile, TEXT_KEY
+from core.project_state import (
+    scan_project,
+    DEFAULT_ALGORITHM,
+    DEFAULT_WORKERS
+)
+
+
+# --------------------------------------------------------------
+# WORKSPACE SNAPSHOT
+# --------------------------------------------------------------
+# Built once per zani command: one walk, one stat and at most one
+# read per file. Everything that used to rescan the tree (context
+# text, registry hashes, token estimates) reads from here.
+# --------------------------------------------------------------
+
+class WorkspaceSnapshot:
+
+    def __init__(self, root, files, hashes, sizes, total_bytes,
+                 algorithm, contents, cfg, non_ascii, estimator):
+        self.root = root
+        self.files = files
+        self.hashes = hashes
+        self.sizes = sizes
+        self.total_bytes = total_bytes
+        self.algorithm = algorithm
+        self.cfg = cfg
+
+        # bytes of every file already read while hashing
+        self._contents = contents
+        self._context = None
+
+        # non-ASCII byte counts come from the manifest, so calibrated
+        # estimates need no extra read
+        self.non_ascii = non_ascii
+        self.estimator = estimator
+        self.tokens = {
+            f: estimator.file_tokens(f, s, non_ascii.get(f, 0))
+            for f, s in sizes.items()
+        }
+        self.project_tokens = sum(self.tokens.values())
+
+    # ----------------------------------------------------------
+    # CAPTURE
+    # ----------------------------------------------------------
+
+    @classmethod
+    def capture(cls, root, cfg):
+        hashing = cfg.get("hashing", {})
+        algorithm = hashing.get("algorithm", DEFAULT_ALGORITHM)
+        full_verify = cfg.get("manifest", {}).get("full_verify", False)
+
+        estimator = TokenEstimator(root, cfg)
+
+        if not full_verify:
+            snapshot = cls.from_watcher(root, cfg, algorithm, estimator)
+            if snapshot is not None:
+                return snapshot
+
+        shield = SafetyShield()
+        stats = shield.scan_workspace_stats(root)
+        files = sorted(f for f in stats if not f.startswith(".zani"))
+        contents = {}
+        non_ascii = {}
+
+        hashes, total, sizes = scan_project(
+            root,
+            files,
+            full_verify=full_verify,
+            algorithm=algorithm,
+            workers=hashing.get("workers"),
+            contents=contents,
+            stats=stats,
+            non_ascii=non_ascii,
+            estimator=estimator
+        )
+
+        files = [f for f in files if f in hashes]
+
+        return cls(root, files, hashes, sizes, total, algorithm, contents, cfg,
+                   non_ascii, estimator)
+
+    @classmethod
+    def from_watcher(cls, root, cfg, algorithm, estimator):
+        """Snapshot straight from a live watcher's manifest: no walk, no stat."""
+        from core.watcher import watched_manifest
+
+        manifest = watched_manifest(root, cfg, algorithm)
+        if not manifest:
+            return None
+
+        entries = manifest.get("files", {})
+        files = sorted(entries)
+        hashes = {f: entries[f]["digest"] for f in files}
+        sizes = {f: entries[f]["size"] for f in files}
+        non_ascii = {f: entries[f].get("non_ascii", 0) for f in files}
+
+        return cls(root, files, hashes, sizes, sum(sizes.values()), algorithm, {}, cfg,
+                   non_ascii, estimator)
+
+    # ----------------------------------------------------------
+    # HASHES UNDER ANOTHER ALGORITHM
+    # ----------------------------------------------------------
+
+    def hashes_for(self, algorithm):
+        """
+        (hashes, total_bytes, sizes) computed with the given algorithm.
+        Only needed while a registry still uses an older algorithm.
+        """
+        if algorithm == self.algorithm:
+            return self.hashes, self.total_bytes, self.sizes
+
+        hashing = self.cfg.get("hashing", {})
+        return scan_project(
+            self.root,
+            self.files,
+            full_verify=self.cfg.get("manifest", {}).get("full_verify", False),
+            algorithm=algorithm,
+            workers=hashing.get("workers"),
+            manifest_path=os.path.join(".zani", f"manifest.{algorithm}.json"),
+            estimator=self.estimator
+        )
+
+    # ----------------------------------------------------------
+    # CONTENT
+    # ----------------------------------------------------------
+
+    def read(self, rel):
+        data = self._contents.get(rel)
+        if data is None:
+            try:
+                with open(os.path.join(self.root, rel), "rb") as f:
+                    data = f.read()
+            except OSError:
+                return None
+            self._contents[rel] = data
+        return data
+
+    def text(self, rel):
+        data = self.read(rel)
+        if data is None:
+            return None
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+
+    def files_profile(self, files):
+        profile = {}
+        for f in files:
+            if f in self.sizes:
+                add_profile(profile, self.estimator.file_profile(f, self.sizes[f], self.non_ascii.get(f, 0)))
+        return profile
+
+    def profile(self):
+        """Token-estimator profile of self.context, from sizes alone."""
+        profile = self.files_profile(self.files)
+        # marker, plus "\nFile: {f}\n```\n" + "\n```\n" around every file
+        overhead = len(GENESIS_MARKER) + 1 + sum(len(f) + 17 for f in self.files)
+        return add_profile(profile, {TEXT_KEY: overhead})
+
+    @property
+    def context(self):
+        if self._context is None:
+            missing = [f for f in self.files if f not in self._contents]
+            workers = self.cfg.get("hashing", {}).get("workers") or DEFAULT_WORKERS
+            if len(missing) > 1 and workers > 1:
+                from concurrent.futures import ThreadPoolExecutor
+                with ThreadPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+                    list(pool.map(self.read, missing))
+
+            parts = [GENESIS_MARKER + "\n"]
+            for f in self.files:
+                text = self.text(f)
+                if text is None:
+                    continue
+                parts.append(f"\nFile: {f}\n```\n{text}\n```\n")
+
+            self._context = "".join(parts)
+
+        return self._context
@@ -12,7 +12,9 @@ from google.genai import types
 SYSTEM_IDENTITY = (
     "You are Zani, a coding agent.\n"
     "Follow history for latest file versions.\n"
-    "Use tools when file operations are required."
+    "Use tools when file operations are required.\n"
+    "To change part of an existing file use apply_patch or replace_range; "
+    "use write_to_file only for new files or full rewrites."
 )
 
 
@@ -50,6 +52,139 @@ def build_write_file_tool_schema():
     )
 
 
+def build_edit_tools_schema():
+    return types.Tool(
+        function_declarations=[
+            types.FunctionDeclaration(
+                name="apply_patch",
+                description=(
+                    "Apply a unified diff to one existing file. Include a few "
+                    "unchanged context lines around every change. The patch "
+                    "is rejected unless every hunk matches the current file."
+                ),
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "filename": {
+                            "type": "string",
+                            "description": "File path to patch"
+                        },
+                        "patch": {
+                            "type": "string",
+                            "description": "Unified diff with @@ hunks for this file"
+                        }
+                    },
+                    "required": ["filename", "patch"]
+                }
+            ),
+            types.FunctionDeclaration(
+                name="replace_range",
+                description=(
+                    "Replace an exact snippet of a file. old_text must appear "
+                    "in the file verbatim; if it appears more than once, "
+                    "start_line picks the nearest occurrence."
+                ),
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "filename": {
+                            "type": "string",
+                            "description": "File path to edit"
+                        },
+                        "old_text": {
+                            "type": "string",
+                            "description": "Exact current text to replace"
+                        },
+                        "new_text": {
+                            "type": "string",
+                            "description": "Replacement text"
+                        },
+                        "start_line": {
+                            "type": "integer",
+                            "description": "Approximate 1-based line of old_text"
+                        }
+                    },
+                    "required": ["filename", "old_text", "new_text"]
+                }
+            )
+        ]
+    )
+
+
+def build_read_tools_schema():
+    return types.Tool(
+        function_declarations=[
+            types.FunctionDeclaration(
+                name="read_file",
+                description=(
+                    "Read a workspace file with line numbers. Allowed in chat "
+                    "mode. Use start_line/end_line for large files."
+                ),
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "filename": {
+                            "type": "string",
+                            "description": "File path relative to the workspace"
+                        },
+                        "start_line": {
+                            "type": "integer",
+                            "description": "First line to return (1-based)"
+                        },
+                        "end_line": {
+                            "type": "integer",
+                            "description": "Last line to return (inclusive)"
+                        }
+                    },
+                    "required": ["filename"]
+                }
+            ),
+            types.FunctionDeclaration(
+                name="list_dir",
+                description="List a workspace directory. Allowed in chat mode.",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": "Directory relative to the workspace (default .)"
+                        },
+                        "recursive": {
+                            "type": "boolean",
+                            "description": "List every file below path"
+                        }
+                    }
+                }
+            ),
+            types.FunctionDeclaration(
+                name="grep",
+                description=(
+                    "Search workspace files for a string (or regex). Returns "
+                    "file:line: text matches. Allowed in chat mode."
+                ),
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "pattern": {
+                            "type": "string",
+                            "description": "Text to search for"
+                        },
+                        "path": {
+                            "type": "string",
+                            "description": "Limit the search to this file or directory"
+                        },
+                        "regex": {
+                            "type": "boolean",
+                            "description": "Treat pattern as a regular expression"
+                        }
+                    },
+                    "required": ["pattern"]
+                }
+            )
+        ]
+    )
+
+
 # --------------------------------------------------------------
 # ZANI BRAIN
 # --------------------------------------------------------------
@@ -62,7 +197,9 @@ class ZaniBrain:
 
         # TOOL SCHEMAS ONLY (NOT PYTHON FUNCTIONS)
         self.tools = [
-            build_write_file_tool_schema()
+            build_write_file_tool_schema(),
+            build_edit_tools_schema(),
+            build_read_tools_schema()
         ]
 
         # Base config (used when NO explicit cache)
@@ -72,6 +209,16 @@ class ZaniBrain:
         )
 
 
+    # ----------------------------------------------------------
+    # FIXED PROMPT OVERHEAD
+    # ----------------------------------------------------------
+    def overhead_text(self):
+        """System instruction and tool schemas, as sent with every request."""
+        return SYSTEM_IDENTITY + "".join(
+            t.model_dump_json(exclude_none=True) for t in self.tools
+        )
+
+
     # ----------------------------------------------------------
     # START CHAT SESSION
     # ----------------------------------------------------------
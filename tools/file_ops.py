@@ -0,0 +1,231 @@
+import os
+import re
+
+from core.project_state import load_manifest
+
+# ==============================================================
+# READ-ONLY FILE TOOLS
+# ==============================================================
+# Let the model pull the files it needs instead of receiving the
+# whole codebase up front. Paths are resolved against the current
+# workspace and never leave it; ignored paths stay invisible.
+# ==============================================================
+
+MAX_READ_LINES = 400
+MAX_LIST_ENTRIES = 500
+MAX_GREP_RESULTS = 100
+MAX_LINE_CHARS = 200
+
+LAZY_MARKER = "--- PROJECT MAP (FILES ON DEMAND) ---"
+
+_shield = None
+
+# files written by this process (core.tools); the manifest may predate
+# them, so they are checked on disk instead
+_written = set()
+
+
+def _get_shield():
+    global _shield
+    if _shield is None:
+        from core.safety_layers import SafetyShield
+        _shield = SafetyShield()
+    return _shield
+
+
+def _resolve(path):
+    """(full, rel) inside the workspace, or raise ValueError."""
+    root = os.path.realpath(os.getcwd())
+    full = os.path.realpath(os.path.join(root, path or "."))
+
+    if full != root and not full.startswith(root + os.sep):
+        raise ValueError(f"{path} is outside the workspace")
+
+    rel = os.path.relpath(full, root)
+    if rel == ".":
+        return full, ""
+
+    if rel.split(os.sep)[0] == ".zani" or _get_shield().is_ignored(root, rel, os.path.isdir(full)):
+        raise ValueError(f"{path} is ignored")
+    return full, rel
+
+
+def note_written(paths):
+    root = os.path.realpath(os.getcwd())
+    for path in paths:
+        full = os.path.realpath(path)
+        if full.startswith(root + os.sep):
+            _written.add(os.path.relpath(full, root))
+
+
+def _workspace_files():
+    """
+    Relative paths from the manifest, or a fresh walk if there is none.
+    Files written during this run are added or dropped by a stat.
+    """
+    root = os.getcwd()
+    files = load_manifest(root).get("files")
+    if not files:
+        return sorted(f for f in _get_shield().scan_workspace(root) if not f.startswith(".zani"))
+
+    files = set(files)
+    shield = _get_shield()
+    for rel in _written:
+        if os.path.isfile(rel) and not shield.is_ignored(root, rel, False):
+            files.add(rel)
+        else:
+            files.discard(rel)
+    return sorted(files)
+
+
+# --------------------------------------------------------------
+# READ
+# --------------------------------------------------------------
+
+def read_file(filename: str, start_line=None, end_line=None) -> str:
+    """
+    Lines start_line..end_line (1-based, inclusive) of a file, each
+    prefixed with its line number. At most MAX_READ_LINES per call.
+    """
+    try:
+        full, rel = _resolve(filename)
+        with open(full, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except (ValueError, OSError) as e:
+        return f"❌ read_file failed: {e}"
+
+    start = max(1, int(start_line or 1))
+    end = min(len(lines), int(end_line or len(lines)))
+    truncated = end - start + 1 > MAX_READ_LINES
+    if truncated:
+        end = start + MAX_READ_LINES - 1
+
+    width = len(str(end))
+    body = "\n".join(f"{i:>{width}}| {lines[i - 1]}" for i in range(start, end + 1))
+    header = f"{rel} (lines {start}-{end} of {len(lines)})"
+    if truncated:
+        header += f" [truncated, request start_line={end + 1} for more]"
+    return f"{header}\n{body}"
+
+
+# --------------------------------------------------------------
+# LIST
+# --------------------------------------------------------------
+
+def list_dir(path: str = ".", recursive: bool = False) -> str:
+    """Directory entries (dirs end with /), or every file below path."""
+    try:
+        full, rel = _resolve(path)
+    except ValueError as e:
+        return f"❌ list_dir failed: {e}"
+    if not os.path.isdir(full):
+        return f"❌ list_dir failed: {path} is not a directory"
+
+    if recursive:
+        prefix = rel + os.sep if rel else ""
+        entries = [f[len(prefix):] for f in _workspace_files() if f.startswith(prefix)]
+    else:
+        root = os.getcwd()
+        shield = _get_shield()
+        entries = []
+        with os.scandir(full) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                child = os.path.join(rel, entry.name) if rel else entry.name
+                is_dir = entry.is_dir()
+                if child.split(os.sep)[0] == ".zani" or shield.is_ignored(root, child, is_dir):
+                    continue
+                if is_dir:
+                    entries.append(entry.name + "/")
+                elif shield.is_human_readable(entry.path):
+                    entries.append(entry.name)
+
+    more = len(entries) - MAX_LIST_ENTRIES
+    out = "\n".join(entries[:MAX_LIST_ENTRIES])
+    if more > 0:
+        out += f"\n[... {more} more entries]"
+    return f"{rel or '.'}/\n{out}"
+
+
+# --------------------------------------------------------------
+# GREP
+# --------------------------------------------------------------
+
+def grep(pattern: str, path: str = ".", regex: bool = False, max_results=MAX_GREP_RESULTS) -> str:
+    """
+    "file:line: text" for every matching line in workspace files under
+    path. Candidates come from the manifest; files that cannot contain
+    the pattern are rejected with a bytes search before decoding.
+    """
+    try:
+        _, rel = _resolve(path)
+        compiled = re.compile(pattern if regex else re.escape(pattern))
+    except (ValueError, re.error) as e:
+        return f"❌ grep failed: {e}"
+
+    prefix = rel + os.sep if rel else ""
+    files = [f for f in _workspace_files() if f.startswith(prefix) or f == rel]
+
+    # literal prefilter: a match needs the literal bytes somewhere in the file
+    literal = None if regex else pattern.encode("utf-8")
+    max_results = int(max_results or MAX_GREP_RESULTS)
+
+    def _search(f):
+        try:
+            with open(f, "rb") as fh:
+                data = fh.read()
+        except OSError:
+            return None
+        if literal is not None and literal not in data:
+            return []
+        found = []
+        for n, line in enumerate(data.decode("utf-8", "replace").splitlines(), 1):
+            if compiled.search(line):
+                found.append(f"{f}:{n}: {line.strip()[:MAX_LINE_CHARS]}")
+                if len(found) >= max_results:
+                    break
+        return found
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        per_file = list(pool.map(_search, files))
+
+    hits = [h for found in per_file if found for h in found]
+    missing = sum(found is None for found in per_file)
+    note = f"\n[{missing} listed file(s) could not be read (deleted?)]" if missing else ""
+    if not hits:
+        return f"no matches for {pattern!r}{note}"
+
+    more = len(hits) - max_results
+    out = "\n".join(hits[:max_results])
+    if more > 0:
+        out += f"\n[... {more} more matches, narrow the pattern or path]"
+    return out + note
+
+
+# --------------------------------------------------------------
+# LAZY CONTEXT
+# --------------------------------------------------------------
+
+def build_lazy_context(snapshot, cfg):
+    """Project map only; the model reads what it needs with the tools above."""
+    from core.rag_engine import project_map
+
+    max_files = cfg.get("retrieval", {}).get("map_max_files", 400)
+    return (
+        LAZY_MARKER + "\n"
+        "The codebase is not included. Use list_dir, grep and read_file "
+        "to look at the files you need before answering.\n"
+        "\nProject files:\n"
+        + project_map(snapshot.files, max_files)
+    )
+
+
+# Tools that never modify the workspace: run without confirmation,
+# in chat mode too, and their results go back to the model.
+FILE_OPS = {
+    "read_file": read_file,
+    "list_dir": list_dir,
+    "grep": grep
+}
+
+READ_ONLY_TOOLS = frozenset(FILE_OPS)
@@ -1,27 +1,38 @@
 import argparse
 import os
-import json
 import sys
-import yaml
+import time
+from datetime import datetime, timedelta, timezone
 
-from google.genai import types
-
-from core.safety_layers import SafetyShield
 from core.memory import MemoryManager
-from core.tools import AVAILABLE_TOOLS
-from core.cache_manager import CacheManager
-from core.zani_brain import ZaniBrain
+from tools.file_ops import READ_ONLY_TOOLS
+from core.tools import (
+    AVAILABLE_TOOLS,
+    FILE_EDITS,
+    PatchError,
+    apply_writes,
+    read_current
+)
+from core.cache_worker import CacheWorker, finish_pending
 
 from core.project_state import (
-    scan_project,
     diff_projects,
-    compute_change_magnitude
+    compute_change_magnitude,
+    build_delta_overlay,
+    DEFAULT_ALGORITHM
 )
+from core.token_estimator import TokenEstimator, add_profile, TEXT_KEY
 
 from core.registry_manager import RegistryManager
-from core.rebake_engine import rebake_decision, compute_expiry
+from core.rebake_engine import (
+    rebake_decision,
+    compute_expiry,
+    observed_query_rate,
+    plan_rebake
+)
 
 from core.visuals import (
+    set_color_depth,
     show_init,
     show_threshold,
     show_cache_maker,
@@ -33,16 +44,27 @@ from core.visuals import (
 # ==============================
 # ✨ RICH UI
 # ==============================
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
-from rich.rule import Rule
-from rich import box
-from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
+# google.genai, rich and PIL are imported on first use so that
+# `zani --help`, argument errors and `zani stop` start fast.
+
+_console = None
+
+
+def get_console():
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+
+class _LazyConsole:
+    # attribute access only; pass get_console() where rich needs the object
+    def __getattr__(self, name):
+        return getattr(get_console(), name)
 
-console = Console()
+
+console = _LazyConsole()
 
 
 GENESIS_MARKER = "--- INITIAL CODEBASE SNAPSHOT ---"
@@ -60,27 +82,22 @@ def load_config():
     path = os.path.join(base, "config", "settings.yaml")
     if not os.path.exists(path):
         return {}
+
+    import yaml
     return yaml.safe_load(open(path, "r"))
 
 
+def hash_algorithm(cfg):
+    return cfg.get("hashing", {}).get("algorithm", DEFAULT_ALGORITHM)
+
+
 # ==============================================================
 # PROJECT SNAPSHOT
 # ==============================================================
 
-def build_project_context():
-    shield = SafetyShield()
-    files = sorted(shield.scan_workspace(os.getcwd()))
-    files = [f for f in files if not f.startswith(".zani")]
-
-    context = GENESIS_MARKER + "\n"
-    for f in files:
-        try:
-            with open(f, "r", encoding="utf-8") as file:
-                context += f"\nFile: {f}\n```\n{file.read()}\n```\n"
-        except Exception:
-            pass
-
-    return context, files
+def capture_workspace(cfg):
+    from core.workspace import WorkspaceSnapshot
+    return WorkspaceSnapshot.capture(os.getcwd(), cfg)
 
 
 # ==============================================================
@@ -97,93 +114,43 @@ def split_history_genesis(history):
     return None, history
 
 
-# ==============================================================
-# TOKEN ESTIMATION
-# ==============================================================
-
-def estimate_project_tokens(files):
-    cm = CacheManager()
-    return cm.estimate_tokens(files)
-
-
-def estimate_history_tokens(memory):
-    history = memory.load_history()
-    _, convo = split_history_genesis(history)
-    total_chars = len(json.dumps(convo))
-    return total_chars // 4
-
-
 # ==============================================================
 # HISTORY SUMMARIZATION
 # ==============================================================
 
-def maybe_summarize_history(memory, brain):
-    history = memory.load_history()
-    genesis, convo = split_history_genesis(history)
-
-    if not convo:
+def maybe_summarize_history(memory, brain, cfg=None):
+    """
+    Rolling summary: once the summarizable turns pass the threshold,
+    the oldest ones are folded into the single existing summary block.
+    The threshold check reads the persisted counters only; history is
+    loaded just when a fold is due. Called after the response is shown.
+    """
+    if memory.token_counts()["summarizable"] < SUMMARY_THRESHOLD_TOKENS:
         return
 
-    protected = []
-    summarizable = []
-
-    for m in convo:
-        text = m["parts"][0]["text"]
-
-        if memory.is_file_update(text):
-            protected.append(m)
-        elif memory.is_summary(text):
-            protected.append(m)
-        else:
-            summarizable.append(m)
-
-    token_est = len(json.dumps(summarizable)) // 4
+    from core.history_compressor import fold_history, CHUNK_TOKENS, MAX_WORKERS
 
-    if token_est < SUMMARY_THRESHOLD_TOKENS:
-        return
+    scfg = (cfg or {}).get("summary", {})
 
-    console.print("\n[bold yellow]⚠ History exceeds threshold. Compressing...[/bold yellow]")
+    def summarize(prompt):
+        session = brain.start_session([], None)
+        return session.send_message(prompt).text
 
-    keep_n = max(2, int(len(summarizable) * RECENT_KEEP_RATIO))
-    old_block = summarizable[:-keep_n]
-    recent_block = summarizable[-keep_n:]
+    console.print("[dim]Folding older turns into the conversation summary...[/dim]")
 
-    text_to_summarize = "\n".join(
-        f"{m['role']}: {m['parts'][0]['text']}"
-        for m in old_block
+    new_history = fold_history(
+        memory.load_history(),
+        memory,
+        summarize,
+        RECENT_KEEP_RATIO,
+        chunk_tokens=scfg.get("chunk_tokens", CHUNK_TOKENS),
+        max_workers=scfg.get("max_workers", MAX_WORKERS)
     )
+    if new_history is None:
+        return
 
-    summary_prompt = (
-        "Summarize the following conversation.\n"
-        "Preserve:\n"
-        "- decisions made\n"
-        "- file changes\n"
-        "- architectural modifications\n"
-        "Be concise but technically accurate.\n\n"
-        + text_to_summarize
-    )
-
-    session = brain.start_session([], None)
-    resp = session.send_message(summary_prompt)
-    summary_text = resp.text or "Summary unavailable."
-
-    new_history = []
-
-    if genesis:
-        new_history.append(genesis)
-
-    new_history.extend(protected)
-
-    new_history.append({
-        "role": "system",
-        "parts": [{
-            "text": "Conversation summary:\n" + summary_text
-        }]
-    })
-
-    new_history.extend(recent_block)
-
-    memory._write(new_history)
+    # folded turns leave the journal, index and blob store for good
+    memory.compact(new_history)
 
     console.print("[bold green]✓ History compressed[/bold green]\n")
 
@@ -192,29 +159,37 @@ def maybe_summarize_history(memory, brain):
 # HISTORY PREPARATION
 # ==============================================================
 
-def get_prepared_history(memory, active_cache):
+def get_prepared_history(memory, active_cache, snapshot, include_genesis=True,
+                         overlay=None):
+    from google.genai import types
+
     history = memory.load_history()
+    genesis, convo = split_history_genesis(history)
 
-    if not history and not active_cache:
-        ctx, _ = build_project_context()
-        memory.save_genesis_block(ctx)
+    # history may have been started in retrieval mode without a genesis
+    if genesis is None and include_genesis and not active_cache:
+        memory.save_genesis_block(snapshot.context)
         history = memory.load_history()
+        genesis, convo = split_history_genesis(history)
 
-    genesis, convo = split_history_genesis(history)
-
-    if active_cache:
+    if active_cache or not include_genesis:
         history_to_send = convo
     else:
         history_to_send = history
 
     prepared = []
 
+    # delta overlay sits right after the cached snapshot
+    if overlay and active_cache:
+        prepared.append(types.Content(role="user", parts=[types.Part(text=overlay)]))
+
     for h in history_to_send:
         role = h["role"]
         if role not in ("user", "model"):
             role = "user"
 
-        parts = [types.Part(text=p["text"]) for p in h["parts"]]
+        # blob-backed parts are hydrated only here, when actually sent
+        parts = [types.Part(text=memory.part_text(p)) for p in h["parts"]]
         prepared.append(types.Content(role=role, parts=parts))
 
     return prepared
@@ -224,7 +199,15 @@ def get_prepared_history(memory, active_cache):
 # TOKEN RECEIPT (PRETTY)
 # ==============================================================
 
-def print_receipt(usage, model):
+def print_receipt(usage, model, ttft=None, estimate=None, response_cache=None):
+    """
+    estimate: (estimated, actual) input tokens of the first request.
+    response_cache: (status, hits, misses) of the local response cache.
+    usage is None when no request was made (response cache hit).
+    """
+    from rich.table import Table
+    from rich import box
+
     in_t = getattr(usage, 'prompt_token_count', 0) or 0
     out_t = getattr(usage, 'candidates_token_count', 0) or 0
     cached = getattr(usage, 'cached_content_token_count', 0) or 0
@@ -233,10 +216,20 @@ def print_receipt(usage, model):
     table.add_column("Metric", style="cyan")
     table.add_column("Value", justify="right")
 
-    table.add_row("Input", str(in_t))
-    table.add_row("Output", str(out_t))
-    table.add_row("Cached", str(cached))
-    table.add_row("Cache Status", "HIT" if cached else "MISS")
+    if usage is not None:
+        table.add_row("Input", str(in_t))
+        table.add_row("Output", str(out_t))
+        table.add_row("Cached", str(cached))
+        table.add_row("Cache Status", "HIT" if cached else "MISS")
+    if ttft is not None:
+        table.add_row("Time to First Token", f"{ttft:.2f}s")
+    if estimate is not None:
+        estimated, actual = estimate
+        error = 100 * (estimated - actual) / actual
+        table.add_row("Input Estimate", f"{estimated} ({error:+.1f}%)")
+    if response_cache is not None:
+        status, hits, misses = response_cache
+        table.add_row("Response Cache", f"{status} ({hits} hits / {misses} misses)")
 
     console.print()
     console.print(table)
@@ -247,113 +240,516 @@ def print_receipt(usage, model):
 # TOOL EXECUTION
 # ==============================================================
 
-def execute_tools(response, memory, act_mode):
+# model turns answered with read-only tool results per prompt
+MAX_READ_ROUNDS = 8
+
+# act mode agent loop: model turns and total tokens per prompt
+AGENT_MAX_STEPS = 12
+AGENT_TOKEN_BUDGET = 400_000
 
+# read-only results kept in history (the model can read the file again)
+READ_RESULT_HISTORY_CHARS = 500
+
+
+def response_parts(response):
+    """(text, function_calls) of a non-streamed response."""
     if not response.candidates:
-        return
+        return "", []
 
     content = response.candidates[0].content
     if not content or not content.parts:
-        return
-
-    tool_calls_found = False
+        return "", []
+
+    text = "".join(part.text for part in content.parts if part.text)
+    calls = [part.function_call for part in content.parts if part.function_call]
+    return text, calls
+
+
+def function_responses(results):
+    """Parts that answer every function call of a model turn."""
+    from google.genai import types
+
+    return [
+        types.Part.from_function_response(name=call.name, response={"result": result})
+        for call, result in results
+    ]
+
+
+def history_result(call, result):
+    # read-only results can be whole files; the model can read them again
+    if call.name in READ_ONLY_TOOLS and len(result) > READ_RESULT_HISTORY_CHARS:
+        return result[:READ_RESULT_HISTORY_CHARS] + f"\n... [{len(result)} chars]"
+    return result
+
+
+def run_tool(call):
+    """A wrong tool name or bad arguments become the function response."""
+    tool = AVAILABLE_TOOLS.get(call.name)
+    if tool is None:
+        return f"❌ Unknown tool: {call.name}"
+    try:
+        return tool(**(call.args or {}))
+    except (TypeError, ValueError, KeyError) as e:
+        return f"❌ {call.name} failed: {e}"
+
+
+def plan_tool_calls(calls):
+    """
+    Split calls into file edits, applied as one transaction, and other
+    mutating tools, run one by one. Read-only tools are left out.
+    Edits are computed against the current file (or an earlier edit of
+    it in the same batch), so a patch that does not apply is caught
+    before anything is written.
+    Returns (edits, others, rejected) with edits as
+    [(call, filename, new_content)] and rejected as {id(call): message}.
+    """
+    edits = []
+    others = []
+    rejected = {}
+    pending = {}
+
+    for call in calls:
+        edit = FILE_EDITS.get(call.name)
+        if edit is None:
+            if call.name not in READ_ONLY_TOOLS:
+                others.append(call)
+            continue
 
-    for part in content.parts:
+        args = dict(call.args or {})
+        filename = str(args.get("filename") or "")
+        key = os.path.abspath(filename)
+        current = pending[key] if key in pending else read_current(filename)
 
-        if not part.function_call:
+        try:
+            content = edit(current, **args)
+        except (PatchError, TypeError) as e:
+            rejected[id(call)] = f"❌ {call.name} rejected for {filename}: {e}"
             continue
 
-        tool_calls_found = True
-        call = part.function_call
+        pending[key] = content
+        edits.append((call, filename, content))
 
-        console.print(Panel(
-            f"[bold]MODEL REQUESTED TOOL[/bold]\n{call.name}",
-            border_style="magenta"
-        ))
+    return edits, others, rejected
+
+
+def show_tool_plan(edits, others, rejected):
+    from rich.table import Table
+
+    table = Table(title="MODEL REQUESTED TOOLS", border_style="magenta")
+    table.add_column("#", justify="right")
+    table.add_column("Tool")
+    table.add_column("Target")
+    table.add_column("Action")
+
+    i = 0
+    for call, filename, content in edits:
+        i += 1
+        action = "overwrite" if os.path.exists(filename) else "create"
+        if call.name != "write_to_file":
+            action = "edit"
+        table.add_row(str(i), call.name, filename, f"{action}, {content.count(chr(10)) + 1} lines")
+    for call in others:
+        i += 1
+        table.add_row(str(i), call.name, "", str(dict(call.args or {}))[:60])
+
+    console.print(table)
+    for msg in rejected.values():
+        console.print(f"[red]{msg}[/red]")
+
+
+def execute_tool_calls(calls, memory, act_mode):
+    """
+    Run read-only calls directly (chat mode too). Show every mutating
+    call in one plan, ask once, apply all edits atomically. The batch
+    is recorded in history with one flush. Returns [(call, result)] in
+    call order.
+    """
+    edits, others, rejected = plan_tool_calls(calls)
+    results = dict(rejected)
+    ok = False
+
+    if edits or others or rejected:
+        show_tool_plan(edits, others, rejected)
 
         if not act_mode:
             console.print("[red]⚠ Tool execution blocked (CHAT MODE)[/red]")
-            memory.save_turn(
-                "user",
-                f"BLOCKED TOOL CALL {call.name} {call.args}"
-            )
-            continue
+            for call in calls:
+                if call.name not in READ_ONLY_TOOLS:
+                    results[id(call)] = "BLOCKED (CHAT MODE)"
+        elif rejected:
+            # a later edit may depend on the rejected one: apply nothing
+            console.print("[red]Batch not applied: fix the rejected edits first.[/red]")
+            for call in calls:
+                if call.name not in READ_ONLY_TOOLS:
+                    results.setdefault(id(call), "⏸ Not applied (batch had rejected edits)")
+        elif input(f"apply {len(edits) + len(others)} tool call(s)? (y/n): ").lower() != "y":
+            for call in calls:
+                if call.name not in READ_ONLY_TOOLS:
+                    results[id(call)] = "DECLINED BY USER"
+        else:
+            ok, messages = apply_writes([(f, c) for _, f, c in edits])
+            for (call, _, _), msg in zip(edits, messages):
+                results[id(call)] = msg
 
-        if input("confirm? (y/n): ").lower() != "y":
-            continue
+            for call in others:
+                results[id(call)] = run_tool(call)
 
-        result = AVAILABLE_TOOLS[call.name](**call.args)
+            style = "green" if ok else "red"
+            for msg in messages:
+                console.print(f"[{style}]{msg}[/{style}]")
 
-        if call.name == "write_to_file":
-            memory.save_file_update(
-                call.args["filename"],
-                call.args["content"]
-            )
+    # reads run after the edits so they see the applied batch
+    for call in calls:
+        if call.name in READ_ONLY_TOOLS:
+            console.print(f"[dim]→ {call.name} {dict(call.args or {})}[/dim]")
+            results[id(call)] = run_tool(call)
+
+    written = {id(call): (f, c) for call, f, c in edits} if ok else {}
+
+    turns = []
+    for call in calls:
+        if id(call) in written:
+            turns.append(("user", memory.file_update_log(*written[id(call)])))
+        turns.append(("model", f"TOOL CALL {call.name} {call.args}"))
+        turns.append(("user", f"TOOL RESULT {history_result(call, results[id(call)])}"))
+
+    memory.save_turns(turns)
+
+    return [(call, results[id(call)]) for call in calls]
+
+
+# ==============================================================
+# STREAMING
+# ==============================================================
 
-        memory.save_turn("model", f"TOOL CALL {call.name} {call.args}")
-        memory.save_turn("user", f"TOOL RESULT {result}")
+def response_panel(text):
+    from rich.panel import Panel
+    from rich.markdown import Markdown
 
-    if not tool_calls_found:
-        console.print("[dim]No tool calls in response.[/dim]")
+    return Panel(
+        Markdown(text or "No response."),
+        title="ZANI RESPONSE",
+        border_style="bright_magenta",
+        padding=(1, 2)
+    )
+
+
+def stream_response(session, message, on_first_chunk=None):
+    """
+    Render the reply incrementally and collect its function calls.
+    Returns (text, calls, usage_metadata, ttft_seconds).
+    """
+    from rich.live import Live
+
+    started = time.perf_counter()
+    ttft = None
+    usage = None
+    text = []
+    calls = []
+
+    with Live(response_panel(""), console=get_console(), refresh_per_second=12,
+              vertical_overflow="visible", transient=False) as live:
+
+        for chunk in session.send_message_stream(message):
+
+            if ttft is None:
+                ttft = time.perf_counter() - started
+                if on_first_chunk:
+                    on_first_chunk()
+
+            if chunk.usage_metadata:
+                usage = chunk.usage_metadata
+
+            if not chunk.candidates or not chunk.candidates[0].content:
+                continue
+
+            for part in chunk.candidates[0].content.parts or []:
+                if part.text:
+                    text.append(part.text)
+                    live.update(response_panel("".join(text)))
+                elif part.function_call:
+                    calls.append(part.function_call)
+
+        # a pure tool-call turn leaves no empty panel behind
+        if not text:
+            live.transient = True
+
+    if ttft is None and on_first_chunk:
+        on_first_chunk()
+
+    return "".join(text), calls, usage, ttft
 
 
 # ==============================================================
 # CACHE CHECK
 # ==============================================================
 
-def check_cache_and_project(brain, cfg):
+def overlay_tokens(snapshot, overlay, changed):
+    """Calibrated estimate: changed files by extension, the rest as text."""
+    profile = snapshot.files_profile(changed)
+    rest = len(overlay.encode("utf-8")) - sum(profile.values())
+    add_profile(profile, {TEXT_KEY: max(0, rest)})
+    return snapshot.estimator.estimate(profile)
+
+
+def try_delta_overlay(cfg, snapshot, added, modified, deleted):
+    """
+    Overlay text for a stale cache, or None when overlays are disabled
+    or the overlay is big enough that a full rebake is worth it.
+    """
+    ecfg = cfg["explicit_cache"]
+    if not ecfg.get("delta_overlay", True):
+        return None
+
+    overlay = build_delta_overlay(added, modified, deleted, snapshot.text)
+    delta_tokens = overlay_tokens(snapshot, overlay, added + modified)
+
+    if delta_tokens > ecfg.get("overlay_max_tokens", 6000):
+        return None
+
+    console.print(
+        f"[dim]Cache is stale; sending delta overlay instead of rebaking "
+        f"({len(added) + len(modified)} changed, {len(deleted)} deleted, "
+        f"~{delta_tokens} tokens).[/dim]"
+    )
+    return overlay
+
+
+def save_cache_registry(registry_mgr, cache, snapshot, cfg):
+    new_hashes, new_total, new_sizes = snapshot.hashes_for(hash_algorithm(cfg))
+
+    registry_mgr.save({
+        "cache_id": cache.name,
+        "hash_algorithm": hash_algorithm(cfg),
+        "file_hashes": new_hashes,
+        "file_sizes": new_sizes,
+        "file_tokens": snapshot.tokens,
+        "total_project_bytes": new_total,
+        "ttl_expiry": compute_expiry(cfg["explicit_cache"]["ttl_hours"])
+    })
+
+
+def calibrate_from_cache(brain, cache, snapshot):
+    """A new cache reports the exact token count of the project context."""
+    actual = getattr(getattr(cache, "usage_metadata", None), "total_token_count", 0)
+    profile = snapshot.estimator.text_profile(brain.overhead_text())
+    add_profile(profile, snapshot.profile())
+    snapshot.estimator.observe(profile, actual, "cache")
+
+
+def cache_created(brain, cache, snapshot, registry_mgr, cfg):
+    save_cache_registry(registry_mgr, cache, snapshot, cfg)
+    calibrate_from_cache(brain, cache, snapshot)
+
+
+def start_background_cache(brain, cfg, snapshot, registry_mgr, replaces=None):
+    """Upload a new explicit cache off the critical path; the registry swaps when done."""
+    show_cache_maker()
+    return CacheWorker(
+        brain,
+        cfg["explicit_cache"]["ttl_hours"],
+        on_ready=lambda cache: cache_created(brain, cache, snapshot, registry_mgr, cfg),
+        replaces=replaces
+    ).start(snapshot)
+
+
+def finish_background_caches():
+    for worker, cache in finish_pending():
+        if cache is not None:
+            console.print(f"[bold green]✓ Explicit cache active[/bold green]: {cache.name}")
+        else:
+            console.print(f"[red]Background cache upload failed:[/red] {worker.error}")
+
+
+def rebake_cache(brain, cfg, snapshot, registry_mgr, registry, stale=(None, None)):
+    """
+    Returns (cache_id, overlay) for the current request. In background
+    mode that is `stale`: the old cache (plus overlay) while it is still
+    alive, otherwise the uncached path.
+    """
+    if cfg["explicit_cache"].get("background", False):
+        console.print("[yellow]Rebuilding cache in background...[/yellow]")
+        start_background_cache(
+            brain, cfg, snapshot, registry_mgr, replaces=registry["cache_id"]
+        )
+        return stale
+
+    console.print("[yellow]Rebuilding cache...[/yellow]")
+    brain.terminate_cache(registry["cache_id"])
+    show_cache_maker()
+    cache = brain.create_explicit_cache(
+        snapshot.context,
+        cfg["explicit_cache"]["ttl_hours"]
+    )
+
+    cache_created(brain, cache, snapshot, registry_mgr, cfg)
+
+    console.print(f"[bold green]✓ Explicit cache rebuilt[/bold green]: {cache.name}")
+    return cache.name, None
+
+
+def remaining_ttl_hours(ttl_expiry):
+    if not ttl_expiry:
+        return 0.0
+    left = datetime.fromisoformat(ttl_expiry) - datetime.now(timezone.utc)
+    return max(0.0, left.total_seconds() / 3600)
+
+
+def plan_cache_action(brain, cfg, snapshot, registry_mgr, registry,
+                      diff, decision, reason, registry_expired):
+    """Economic planner: price keep / overlay / rebake / drop and act on the cheapest."""
+    from rich.panel import Panel
+
+    ecfg = cfg["explicit_cache"]
+    added, modified, deleted = diff
+
+    overlay = None
+    delta_tokens = 0
+    if not registry_expired and ecfg.get("delta_overlay", True):
+        overlay = build_delta_overlay(added, modified, deleted, snapshot.text)
+        delta_tokens = overlay_tokens(snapshot, overlay, added + modified)
+
+    query_rate = observed_query_rate(
+        registry_mgr.load_query_times(),
+        datetime.now(timezone.utc),
+        ecfg.get("query_window_hours", 24)
+    )
+
+    choice, _, explanation = plan_rebake(
+        snapshot.project_tokens,
+        delta_tokens,
+        query_rate,
+        remaining_ttl_hours(registry.get("ttl_expiry")),
+        ecfg["ttl_hours"],
+        registry_expired,
+        keep_allowed=decision == "keep",
+        overlay_allowed=overlay is not None
+        and delta_tokens <= ecfg.get("overlay_max_tokens", 6000)
+    )
+
+    if choice == "keep":
+        console.print("[dim]Cache drift tolerated; keeping cache as is.[/dim]")
+        return registry.get("cache_id"), None
+
+    if choice == "overlay":
+        console.print(
+            f"[dim]Cache is stale; sending delta overlay (~{delta_tokens} tokens).\n"
+            f"{explanation}[/dim]"
+        )
+        return registry.get("cache_id"), overlay
+
+    show_threshold()
+    console.print(Panel(
+        f"PLANNER: {choice.upper()}\n"
+        f"Reason: {reason or 'cheapest option'}\n"
+        f"{explanation}",
+        border_style="red" if registry_expired else "yellow"
+    ))
+
+    if choice == "rebake":
+        if input("Rebuild explicit cache now? (y/n): ").lower() == "y":
+            stale = (None, None)
+            if not registry_expired:
+                stale = (registry.get("cache_id"), overlay)
+            return rebake_cache(brain, cfg, snapshot, registry_mgr, registry, stale)
+    else:
+        if input("Drop explicit cache and run uncached? (y/n): ").lower() == "y":
+            brain.terminate_cache(registry["cache_id"])
+            registry_mgr.clear()
+            console.print("[bold green]✓ Cache dropped[/bold green]")
+            return None, None
+
+    console.print("[dim]Continuing with existing cache.[/dim]")
+    if registry_expired:
+        return registry.get("cache_id"), None
+    return registry.get("cache_id"), overlay
+
+
+# queries in the window before the economic planner trusts the rate
+PLANNER_MIN_QUERIES = 5
+
+
+def use_economic_planner(cfg, registry_mgr):
+    """
+    The economic planner prices the cache by the observed query rate,
+    so it only takes over once enough queries have been logged; until
+    then the threshold rules apply.
+    """
+    ecfg = cfg["explicit_cache"]
+    if ecfg.get("planner", "threshold") != "economic":
+        return False
+
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=ecfg.get("query_window_hours", 24))
+    recent = [t for t in registry_mgr.load_query_times() if t >= cutoff]
+    return len(recent) >= ecfg.get("planner_min_queries", PLANNER_MIN_QUERIES)
+
+
+def check_cache_and_project(brain, cfg, snapshot, offer_cache=True):
+    from rich.panel import Panel
+    from rich.rule import Rule
+
     registry_mgr = RegistryManager()
     registry = registry_mgr.load()
 
-    context, files = build_project_context()
-    project_tokens = estimate_project_tokens(files)
+    project_tokens = snapshot.project_tokens
 
     if not registry:
 
-        if project_tokens >= cfg["explicit_cache"]["min_tokens"]:
+        if offer_cache and project_tokens >= cfg["explicit_cache"]["min_tokens"]:
             show_threshold()
             console.print(Rule("EXPLICIT CACHE THRESHOLD REACHED"))
             console.print(f"Project tokens: [cyan]{project_tokens}[/cyan]")
             console.print(f"Threshold: [cyan]{cfg['explicit_cache']['min_tokens']}[/cyan]\n")
 
             if input("Create explicit cache now? (y/n): ").lower() == "y":
+                if cfg["explicit_cache"].get("background", False):
+                    # this request goes out uncached while the cache uploads
+                    start_background_cache(brain, cfg, snapshot, registry_mgr)
+                    return None, None
+
                 show_cache_maker()
                 cache = brain.create_explicit_cache(
-                    context,
+                    snapshot.context,
                     cfg["explicit_cache"]["ttl_hours"]
                 )
 
-                new_hashes, new_total, new_sizes = scan_project(os.getcwd(), files)
-
-                registry_mgr.save({
-                    "cache_id": cache.name,
-                    "file_hashes": new_hashes,
-                    "file_sizes": new_sizes,
-                    "total_project_bytes": new_total,
-                    "ttl_expiry": compute_expiry(cfg["explicit_cache"]["ttl_hours"])
-                })
+                cache_created(brain, cache, snapshot, registry_mgr, cfg)
 
                 console.print(f"[bold green]✓ Explicit cache active[/bold green]: {cache.name}")
-                return cache.name, context
+                return cache.name, None
 
-        return None, context
+        return None, None
 
     old_hashes = registry.get("file_hashes", {})
     old_sizes = registry.get("file_sizes", {})
     total_old_bytes = registry.get("total_project_bytes", 0)
     ttl_expiry = registry.get("ttl_expiry")
 
-    new_hashes, new_total, new_sizes = scan_project(os.getcwd(), files)
+    # Hashes are only comparable when produced by the same algorithm.
+    # Diff with the registry's algorithm; if nothing changed, migrate
+    # the registry to the configured one. Otherwise the next rebake
+    # records the new algorithm.
+    registry_algorithm = registry.get("hash_algorithm", DEFAULT_ALGORITHM)
+
+    new_hashes, new_total, new_sizes = snapshot.hashes_for(registry_algorithm)
     added, modified, deleted = diff_projects(old_hashes, new_hashes)
 
+    if registry_algorithm != hash_algorithm(cfg) and not (added or modified or deleted):
+        new_hashes, new_total, new_sizes = snapshot.hashes_for(hash_algorithm(cfg))
+        registry["file_hashes"] = new_hashes
+        registry["hash_algorithm"] = hash_algorithm(cfg)
+        registry_mgr.save(registry)
+        console.print(f"[dim]Registry rehashed with {hash_algorithm(cfg)}.[/dim]")
+
     changed_bytes, percent, changed_tokens = compute_change_magnitude(
         added, modified, deleted,
-        new_sizes, old_sizes, total_old_bytes
+        new_sizes, old_sizes, total_old_bytes,
+        new_tokens=snapshot.tokens,
+        old_tokens=registry.get("file_tokens")
     )
 
     registry_expired = False
     if ttl_expiry:
-        from datetime import datetime, timezone
         registry_expired = datetime.now(timezone.utc).isoformat() > ttl_expiry
 
     decision, reason = rebake_decision(
@@ -366,6 +762,19 @@ def check_cache_and_project(brain, cfg):
         registry_expired
     )
 
+    if use_economic_planner(cfg, registry_mgr):
+        if added or modified or deleted or registry_expired:
+            return plan_cache_action(
+                brain, cfg, snapshot, registry_mgr, registry,
+                (added, modified, deleted), decision, reason, registry_expired
+            )
+        return registry.get("cache_id"), None
+
+    if decision in ("recommend", "force") and not registry_expired:
+        overlay = try_delta_overlay(cfg, snapshot, added, modified, deleted)
+        if overlay:
+            return registry.get("cache_id"), overlay
+
     if decision in ("recommend", "force"):
 
         style = "red" if decision == "force" else "yellow"
@@ -380,49 +789,21 @@ def check_cache_and_project(brain, cfg):
         console.print(f"Changed tokens: {changed_tokens}\n")
 
         if input("Rebuild explicit cache now? (y/n): ").lower() == "y":
-
-            console.print("[yellow]Rebuilding cache...[/yellow]")
-            brain.terminate_cache(registry["cache_id"])
-            show_cache_maker()
-            cache = brain.create_explicit_cache(
-                context,
-                cfg["explicit_cache"]["ttl_hours"]
-            )
-
-            registry_mgr.save({
-                "cache_id": cache.name,
-                "file_hashes": new_hashes,
-                "file_sizes": new_sizes,
-                "total_project_bytes": new_total,
-                "ttl_expiry": compute_expiry(cfg["explicit_cache"]["ttl_hours"])
-            })
-
-            console.print(f"[bold green]✓ Explicit cache rebuilt[/bold green]: {cache.name}")
-            return cache.name, context
+            stale = (None, None)
+            if not registry_expired:
+                stale = (registry.get("cache_id"), None)
+            return rebake_cache(brain, cfg, snapshot, registry_mgr, registry, stale)
         else:
             console.print("[dim]Continuing with existing cache.[/dim]")
 
-    return registry.get("cache_id"), context
+    return registry.get("cache_id"), None
 
 
 # ==============================================================
 # RUN
 # ==============================================================
 
-def handle_run(brain, prompt, cfg, act=False):
-    memory = MemoryManager()
-
-    maybe_summarize_history(memory, brain)
-
-    cache_id, _ = check_cache_and_project(brain, cfg)
-    history = get_prepared_history(memory, cache_id)
-    session = brain.start_session(history, cache_id)
-
-    if act:
-        show_act()
-    else:
-        show_chat()
-
+def runtime_prompt(prompt, act):
     mode_label = "ACT" if act else "CHAT"
     tools_enabled = "true" if act else "false"
 
@@ -430,127 +811,637 @@ def handle_run(brain, prompt, cfg, act=False):
         "\n\n[ZANI RUNTIME MODE]\n"
         f"mode = {mode_label}\n"
         f"tools_enabled = {tools_enabled}\n"
-        "If tools_enabled=false do not call tools.\n"
+        "If tools_enabled=false only call read-only tools (read_file, list_dir, grep).\n"
         "If tools_enabled=true you may call tools multiple times.\n"
+        "Tool results come back to you; keep calling tools until the task is done, "
+        "then reply with a short summary and no tool calls.\n"
         "Update all required files in one turn when modifying project.\n"
     )
 
-    final_prompt = prompt + runtime_block
+    return prompt + runtime_block
+
+
+def print_agent_steps(steps):
+    from rich.table import Table
+    from rich import box
+
+    table = Table(box=box.ROUNDED, title="AGENT STEPS")
+    for col in ("Step", "Tool calls", "Input", "Output", "Cached", "TTFT", "Model", "Tools"):
+        table.add_column(col, justify="right")
+
+    for i, st in enumerate(steps, 1):
+        table.add_row(
+            str(i),
+            str(st["calls"]),
+            str(st["input"]),
+            str(st["output"]),
+            str(st["cached"]),
+            f"{st['ttft']:.2f}s" if st["ttft"] is not None else "-",
+            f"{st['model_s']:.2f}s",
+            f"{st['tools_s']:.2f}s"
+        )
+
+    table.add_row(
+        "Σ",
+        str(sum(st["calls"] for st in steps)),
+        str(sum(st["input"] for st in steps)),
+        str(sum(st["output"] for st in steps)),
+        str(sum(st["cached"] for st in steps)),
+        "",
+        f"{sum(st['model_s'] for st in steps):.2f}s",
+        f"{sum(st['tools_s'] for st in steps):.2f}s"
+    )
+    console.print(table)
+
+
+def send_prompt(brain, session, outgoing, final_prompt, memory, act, cfg, expected=None,
+                answer=None, response_cache=None):
+    """
+    Send one prompt and keep the session going while the model calls
+    tools: tool results go back as function responses on the same
+    session. Chat mode only continues for read-only tools; act mode
+    continues for any tool until the model stops calling them or the
+    step / token budget (cfg["agent"]) runs out.
+
+    expected = (estimator, profile) of the first request; its estimate
+    is checked against (and calibrated by) the reported prompt tokens.
+    An answer list receives the model text of every step;
+    response_cache is passed through to the receipt.
 
-    response = session.send_message(final_prompt)
-    memory.save_turn("user", final_prompt)
+    Returns True when the loop stopped with unanswered function calls,
+    in which case the session must not be reused.
+    """
+    stream = cfg.get("ui", {}).get("stream", True)
 
     if act:
-        execute_tools(response, memory, True)
+        acfg = cfg.get("agent", {})
+        max_steps = acfg.get("max_steps", AGENT_MAX_STEPS)
+        token_budget = acfg.get("token_budget", AGENT_TOKEN_BUDGET)
     else:
-        console.print(
-            Panel(
-                Markdown(response.text or "No response."),
-                title="ZANI RESPONSE",
-                border_style="bright_magenta",
-                padding=(1, 2)
-            )
+        max_steps = cfg.get("tools", {}).get("max_read_rounds", MAX_READ_ROUNDS) + 1
+        token_budget = None
+
+    message = outgoing
+    saved = []
+    steps = []
+    used = 0
+    pending = False
+
+    def save_prompt():
+        if not saved:
+            memory.save_turn("user", final_prompt)
+            saved.append(True)
+
+    while True:
+        started = time.perf_counter()
+        if stream:
+            text, calls, usage, ttft = stream_response(session, message, on_first_chunk=save_prompt)
+        else:
+            response = session.send_message(message)
+            save_prompt()
+            text, calls = response_parts(response)
+            usage, ttft = response.usage_metadata, None
+            if text:
+                console.print(response_panel(text))
+        model_s = time.perf_counter() - started
+
+        if not steps:
+            RegistryManager().record_query()
+
+        if text:
+            memory.save_turn("model", text)
+            if answer is not None:
+                answer.append(text)
+
+        started = time.perf_counter()
+        results = execute_tool_calls(calls, memory, act) if calls else []
+        tools_s = time.perf_counter() - started
+
+        step = {
+            "calls": len(calls),
+            "input": getattr(usage, "prompt_token_count", 0) or 0,
+            "output": getattr(usage, "candidates_token_count", 0) or 0,
+            "cached": getattr(usage, "cached_content_token_count", 0) or 0,
+            "ttft": ttft,
+            "model_s": model_s,
+            "tools_s": tools_s
+        }
+        steps.append(step)
+        used += step["input"] + step["output"]
+
+        if act and not calls and len(steps) == 1:
+            console.print("[dim]No tool calls in response.[/dim]")
+
+        if act:
+            more = bool(results)
+        else:
+            more = any(call.name in READ_ONLY_TOOLS for call, _ in results)
+        if not more:
+            # blocked calls that were never answered leave the turn open
+            pending = bool(results)
+            break
+
+        if any(result == "DECLINED BY USER" for _, result in results):
+            console.print("[yellow]Stopped: tool calls declined.[/yellow]")
+            pending = True
+            break
+        if len(steps) >= max_steps:
+            console.print(f"[yellow]Stopped after {max_steps} steps (step budget).[/yellow]")
+            pending = True
+            break
+        if token_budget and used >= token_budget:
+            console.print(f"[yellow]Stopped after {used} tokens (token budget {token_budget}).[/yellow]")
+            pending = True
+            break
+
+        message = function_responses(results)
+
+    estimate = None
+    if expected is not None:
+        estimator, profile = expected
+        estimated = estimator.observe(profile, steps[0]["input"], "prompt")
+        if estimated is not None:
+            estimate = (estimated, steps[0]["input"])
+
+    if len(steps) > 1:
+        print_agent_steps(steps)
+    print_receipt(usage, brain.model_name, steps[0]["ttft"], estimate, response_cache)
+
+    return pending
+
+
+def request_profile(brain, snapshot, memory, outgoing, overlay, whole_project):
+    """
+    Estimator profile of the first request of a prompt: system
+    instruction and tools, the project (cached or genesis), overlay,
+    conversation (its stored size, from the running counters) and the
+    prompt itself.
+    """
+    estimator = snapshot.estimator
+    profile = estimator.text_profile(brain.overhead_text())
+
+    if whole_project:
+        add_profile(profile, snapshot.profile())
+    if overlay:
+        add_profile(profile, estimator.text_profile(overlay))
+
+    # raw characters, not the token counter: that one is already
+    # derived from a fixed ratio and would calibrate against itself
+    add_profile(profile, {TEXT_KEY: memory.token_counts()["conversation_chars"]})
+    return add_profile(profile, estimator.text_profile(outgoing))
+
+
+def serve_cached_response(brain, text, final_prompt, memory, rcache):
+    """A response-cache hit: shown and recorded like a live answer, no request."""
+    show_chat()
+    console.print("[dim]Served from the local response cache (--no-cache to ask again).[/dim]")
+    console.print(response_panel(text))
+    memory.save_turns([("user", final_prompt), ("model", text)])
+    print_receipt(None, brain.model_name, response_cache=("HIT", rcache.hits, rcache.misses))
+
+
+def handle_run(brain, prompt, cfg, act=False, context_mode="full"):
+    try:
+        run_prompt(brain, prompt, cfg, act, context_mode)
+    finally:
+        # the session is done (or failed), so a cache replaced by a
+        # background upload can be terminated now; never leave it orphaned
+        finish_background_caches()
+
+
+def run_prompt(brain, prompt, cfg, act, context_mode):
+    from rich.table import Table
+    from rich import box
+
+    memory = MemoryManager()
+
+    partial = context_mode in ("retrieval", "lazy")
+
+    snapshot = capture_workspace(cfg)
+
+    # chat only: an act prompt must always reach the model and its tools
+    rcfg = cfg.get("response_cache", {})
+    rcache = None
+    receipt_cache = None
+    if rcfg.get("enabled", False) and not act:
+        from core.response_cache import (
+            ResponseCache, cache_key, workspace_digest, history_digest
         )
-        memory.save_turn("model", response.text)
 
-    print_receipt(response.usage_metadata, brain.model_name)
+        def response_key():
+            return cache_key(
+                workspace_digest(snapshot.hashes),
+                history_digest(memory, memory.load_history()),
+                brain.model_name,
+                context_mode,
+                prompt
+            )
+
+        rcache = ResponseCache(cfg)
+        if rcfg.get("bypass", False):
+            receipt_cache = ("BYPASS", rcache.hits, rcache.misses)
+        else:
+            cached = rcache.get(response_key())
+            if cached is not None:
+                serve_cached_response(brain, cached, runtime_prompt(prompt, act), memory, rcache)
+                maybe_summarize_history(memory, brain, cfg)
+                return
+            receipt_cache = ("MISS", rcache.hits, rcache.misses)
+    cache_id, overlay = check_cache_and_project(
+        brain, cfg, snapshot, offer_cache=not partial
+    )
+
+    # an explicit cache already holds the whole project; retrieval and
+    # lazy mode only replace the uncached genesis snapshot
+    retrieved_context = None
+    if context_mode == "retrieval" and not cache_id:
+        from core.rag_engine import build_retrieval_context
+        retrieved_context, chunks = build_retrieval_context(snapshot, prompt, cfg)
+        console.print(f"[dim]Retrieved {len(chunks)} chunks for context.[/dim]")
+    elif context_mode == "lazy" and not cache_id:
+        from tools.file_ops import build_lazy_context
+        retrieved_context = build_lazy_context(snapshot, cfg)
+        console.print("[dim]Lazy context: project map only, files read on demand.[/dim]")
+
+    history = get_prepared_history(
+        memory, cache_id, snapshot,
+        include_genesis=retrieved_context is None,
+        overlay=overlay
+    )
+    session = brain.start_session(history, cache_id)
+
+    if act:
+        show_act()
+    else:
+        show_chat()
+
+    final_prompt = runtime_prompt(prompt, act)
+
+    outgoing = final_prompt
+    if retrieved_context:
+        outgoing = retrieved_context + "\n\n" + final_prompt
+
+    answer = []
+    pending = send_prompt(
+        brain, session, outgoing, final_prompt, memory, act, cfg,
+        expected=(snapshot.estimator, request_profile(
+            brain, snapshot, memory, outgoing, overlay,
+            whole_project=retrieved_context is None
+        )),
+        answer=answer,
+        response_cache=receipt_cache
+    )
+
+    # keyed on the history as the next identical prompt will see it
+    # (this run may have written the genesis block)
+    if rcache is not None and answer and not pending:
+        rcache.put(response_key(), "\n\n".join(answer))
 
-    context, files = build_project_context()
-    project_tokens = estimate_project_tokens(files)
-    history_tokens = estimate_history_tokens(memory)
+    # running counters only: neither the history nor the files are re-read
+    counts = memory.token_counts()
 
     stats = Table(box=box.ROUNDED, title="CONTEXT SIZE")
     stats.add_column("Type")
     stats.add_column("Tokens", justify="right")
-    stats.add_row("Project", str(project_tokens))
-    stats.add_row("History", str(history_tokens))
+    stats.add_row("Project", str(snapshot.project_tokens))
+    stats.add_row("Genesis", str(counts["genesis"]))
+    stats.add_row("History", str(counts["conversation"]))
+    stats.add_row("  protected", str(counts["protected"]))
+    stats.add_row("  summarizable", str(counts["summarizable"]))
     console.print(stats)
 
+    # off the critical path: the response has already been shown
+    maybe_summarize_history(memory, brain, cfg)
+
+
+# ==============================================================
+# SHELL (PERSISTENT REPL)
+# ==============================================================
+
+SHELL_HELP = (
+    "/act <prompt>   run one prompt in act mode\n"
+    "/chat <prompt>  run one prompt in chat mode\n"
+    "/mode act|chat  change the default mode\n"
+    "/reset          rebuild the chat session from history\n"
+    "/exit           leave the shell"
+)
+
+
+def handle_shell(brain, cfg):
+    """
+    One client, one chat session and one workspace snapshot for many
+    prompts. Between prompts the workspace is rescanned through the
+    manifest (stat only) and changed files are sent as an overlay.
+    """
+    from rich.rule import Rule
+
+    memory = MemoryManager(fsync_every=cfg.get("shell", {}).get("fsync_every", 64))
+
+    snapshot = capture_workspace(cfg)
+    cache_id, overlay = check_cache_and_project(brain, cfg, snapshot)
+
+    def new_session(cache_id, overlay, snapshot):
+        history = get_prepared_history(memory, cache_id, snapshot, overlay=overlay)
+        return brain.start_session(history, cache_id)
+
+    def cached_hashes(cache_id, snapshot):
+        """What a fresh session on cache_id knows: the registry's hashes."""
+        registry = RegistryManager().load()
+        if (cache_id and registry and registry.get("cache_id") == cache_id
+                and registry.get("hash_algorithm", DEFAULT_ALGORITHM) == snapshot.algorithm):
+            return dict(registry.get("file_hashes", {}))
+        return dict(snapshot.hashes)
+
+    session = new_session(cache_id, overlay, snapshot)
+    known = dict(snapshot.hashes)
+    act = False
+
+    show_chat()
+    console.print(Rule("ZANI SHELL"))
+    console.print("[dim]Type /help for commands.[/dim]\n")
+
+    try:
+        while True:
+            try:
+                line = input("act> " if act else "zani> ").strip()
+            except (EOFError, KeyboardInterrupt):
+                console.print()
+                break
+
+            if not line:
+                continue
+
+            prompt_act = act
+            if line in ("/exit", "/quit"):
+                break
+            if line == "/help":
+                console.print(SHELL_HELP)
+                continue
+            if line.split()[0] == "/mode":
+                args = line.split()[1:]
+                if args not in (["act"], ["chat"]):
+                    console.print("[yellow]Usage: /mode act|chat[/yellow]")
+                    continue
+                act = args[0] == "act"
+                continue
+            if line == "/reset":
+                # drift since the cache was baked goes out as an overlay
+                # with the next prompt
+                session = new_session(cache_id, None, snapshot)
+                known = cached_hashes(cache_id, snapshot)
+                continue
+            if line.startswith("/act "):
+                prompt_act, line = True, line[5:]
+            elif line.startswith("/chat "):
+                prompt_act, line = False, line[6:]
+
+            # incremental refresh: only changed files are re-read
+            snapshot = capture_workspace(cfg)
+
+            # pick up a cache the background worker finished meanwhile
+            registry = RegistryManager().load()
+            registry_cache = registry.get("cache_id") if registry else None
+            if registry_cache and registry_cache != cache_id:
+                finish_background_caches()
+                cache_id = registry_cache
+                session = new_session(cache_id, None, snapshot)
+                known = cached_hashes(cache_id, snapshot)
+
+            added, modified, deleted = diff_projects(known, snapshot.hashes)
+
+            final_prompt = runtime_prompt(line, prompt_act)
+            outgoing = final_prompt
+            if added or modified or deleted:
+                delta = build_delta_overlay(added, modified, deleted, snapshot.text)
+                outgoing = delta + "\n\n" + final_prompt
+                console.print(
+                    f"[dim]Workspace changed: {len(added) + len(modified)} updated, "
+                    f"{len(deleted)} deleted.[/dim]"
+                )
+                known = dict(snapshot.hashes)
+
+            if send_prompt(brain, session, outgoing, final_prompt, memory, prompt_act, cfg):
+                # unanswered function calls: the next prompt needs a clean session
+                session = new_session(cache_id, None, snapshot)
+
+            # the live session keeps its turns; the fold only shrinks what
+            # the next session (or the next `zani` run) loads
+            maybe_summarize_history(memory, brain, cfg)
+    finally:
+        memory.flush()
+        finish_background_caches()
+
 
 # ==============================================================
 # INIT / STOP / MAIN
 # ==============================================================
 
 def handle_init(brain, cfg):
+    from rich.rule import Rule
+
     show_init()
     registry_mgr = RegistryManager()
     memory = MemoryManager()
 
-    context, files = build_project_context()
+    snapshot = capture_workspace(cfg)
     memory.clear_history()
-    memory.save_genesis_block(context)
+    memory.save_genesis_block(snapshot.context)
 
-    project_tokens = estimate_project_tokens(files)
+    project_tokens = snapshot.project_tokens
 
     console.print(Rule("ZANI WORKSPACE ASSESSMENT"))
-    console.print(f"Files scanned: {len(files)}")
+    console.print(f"Files scanned: {len(snapshot.files)}")
     console.print(f"Estimated project tokens: {project_tokens}")
     console.print("Genesis stored locally.\n")
 
     if project_tokens >= cfg["explicit_cache"]["min_tokens"]:
         if input("Create explicit cache? (y/n): ").lower() == "y":
             cache = brain.create_explicit_cache(
-                context,
+                snapshot.context,
                 cfg["explicit_cache"]["ttl_hours"]
             )
 
-            new_hashes, new_total, new_sizes = scan_project(os.getcwd(), files)
-
-            registry_mgr.save({
-                "cache_id": cache.name,
-                "file_hashes": new_hashes,
-                "file_sizes": new_sizes,
-                "total_project_bytes": new_total,
-                "ttl_expiry": compute_expiry(cfg["explicit_cache"]["ttl_hours"])
-            })
+            cache_created(brain, cache, snapshot, registry_mgr, cfg)
 
             console.print(f"[bold green]✓ Explicit cache active[/bold green]: {cache.name}")
 
 
-def handle_stop(brain):
+def handle_stop(cfg):
     registry = RegistryManager().load()
     if not registry:
         console.print("[yellow]No active cache.[/yellow]")
         return
 
     if input("Terminate cache? (y/n): ").lower() == "y":
-        brain.terminate_cache(registry["cache_id"])
+        make_brain(cfg).terminate_cache(registry["cache_id"])
         RegistryManager().clear()
         console.print("[bold green]✓ Cache removed[/bold green]")
 
 
-def main():
-    cfg = load_config()
+def handle_watch(cfg, detach=False, stop=False, status=False):
+    from core.watcher import WorkspaceWatcher, watcher_alive, stop_watcher
+
+    root = os.getcwd()
+    state = watcher_alive(root)
+
+    if stop:
+        if stop_watcher(root):
+            console.print("[bold green]✓ Watcher stopped[/bold green]")
+        else:
+            console.print("[yellow]No watcher running.[/yellow]")
+        return
 
+    if status:
+        if not state:
+            console.print("[yellow]No watcher running.[/yellow]")
+            return
+        age = time.time() - state["heartbeat"]
+        console.print(
+            f"Watcher pid {state['pid']} ({state['backend']}), "
+            f"{state['files']} files, heartbeat {age:.1f}s ago"
+        )
+        return
+
+    if state:
+        console.print(f"[yellow]Watcher already running (pid {state['pid']}).[/yellow]")
+        return
+
+    if detach:
+        import subprocess
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "watch"],
+            cwd=root,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        console.print(f"[bold green]✓ Watcher started[/bold green] (pid {proc.pid})")
+        return
+
+    watcher = WorkspaceWatcher(root, cfg)
+    console.print("[dim]Watching workspace, Ctrl+C to stop.[/dim]")
+
+    def on_change(n_files):
+        console.print(f"[dim]{datetime.now().strftime('%H:%M:%S')} manifest updated ({n_files} files)[/dim]")
+
+    try:
+        watcher.run(on_change)
+    except KeyboardInterrupt:
+        pass
+    console.print(f"[dim]Watcher stopped ({watcher.backend}).[/dim]")
+
+
+def handle_tokens(cfg):
+    from rich.table import Table
+    from rich import box
+
+    estimator = TokenEstimator(".", cfg)
+
+    ratios = Table(box=box.ROUNDED, title="TOKEN ESTIMATOR")
+    ratios.add_column("Content")
+    ratios.add_column("Bytes / token", justify="right")
+    ratios.add_column("Samples", justify="right")
+    for key in sorted(estimator.ratios):
+        ratios.add_row(key, f"{estimator.ratio(key):.2f}", str(estimator.samples.get(key, 0)))
+    if not estimator.ratios:
+        ratios.add_row("(uncalibrated)", f"{estimator.ratio('none'):.2f}", "0")
+    console.print(ratios)
+
+    errors = Table(box=box.ROUNDED, title="ESTIMATION ERROR (mean absolute)")
+    errors.add_column("Source")
+    errors.add_column("Observations", justify="right")
+    errors.add_column("All", justify="right")
+    errors.add_column("First 10", justify="right")
+    errors.add_column("Last 10", justify="right")
+    for source, n, overall, first, recent in estimator.error_report():
+        errors.add_row(source, str(n), f"{overall:.1f}%", f"{first:.1f}%", f"{recent:.1f}%")
+    console.print(errors)
+
+    if not estimator.log:
+        console.print("[dim]No observations yet; they are recorded on every chat/act "
+                      "request and every explicit cache upload.[/dim]")
+
+
+def make_brain(cfg):
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         sys.exit("Missing API key")
 
-    brain = ZaniBrain(api_key, cfg["model"]["name"])
+    from core.zani_brain import ZaniBrain
+    return ZaniBrain(api_key, cfg["model"]["name"])
 
+
+def main():
     parser = argparse.ArgumentParser()
     sub = parser.add_subparsers(dest="cmd")
 
-    sub.add_parser("init")
+    p = sub.add_parser("init")
+    p.add_argument("--verify", action="store_true",
+                   help="ignore the file manifest and rehash every file")
     sub.add_parser("stop")
+    sub.add_parser("shell")
+    sub.add_parser("tokens", help="show the calibrated token estimator and its error over time")
+
+    p = sub.add_parser("watch", help="keep the file manifest current in the background")
+    p.add_argument("--detach", action="store_true", help="run the watcher as a background process")
+    p.add_argument("--stop", action="store_true", help="stop a running watcher")
+    p.add_argument("--status", action="store_true", help="show the running watcher")
 
 
     for c in ["chat", "act"]:
         p = sub.add_parser(c)
         p.add_argument("prompt", nargs='+')
+        p.add_argument("--verify", action="store_true",
+                       help="ignore the file manifest and rehash every file")
+        p.add_argument("--context", choices=["full", "retrieval", "lazy"],
+                       help="send the whole project, only chunks relevant to the prompt, "
+                            "or only a project map with files read on demand")
+        p.add_argument("--no-stream", action="store_true",
+                       help="wait for the full response instead of streaming it")
+        if c == "chat":
+            p.add_argument("--no-cache", action="store_true",
+                           help="skip the local response cache lookup and ask the model")
 
     args = parser.parse_args()
 
+    if args.cmd is None:
+        parser.print_help()
+        return
+
+    cfg = load_config()
+
+    if getattr(args, "verify", False):
+        cfg.setdefault("manifest", {})["full_verify"] = True
+    set_color_depth(cfg.get("ui", {}).get("color_depth"))
+    if getattr(args, "no_stream", False):
+        cfg.setdefault("ui", {})["stream"] = False
+    if getattr(args, "no_cache", False):
+        cfg.setdefault("response_cache", {})["bypass"] = True
+    if getattr(args, "context", None) is None:
+        args.context = cfg.get("retrieval", {}).get("default_mode", "full")
+
+    # the client is only built once a command actually needs it
+    if args.cmd == "stop":
+        handle_stop(cfg)
+        return
+    if args.cmd == "watch":
+        handle_watch(cfg, detach=args.detach, stop=args.stop, status=args.status)
+        return
+    if args.cmd == "tokens":
+        handle_tokens(cfg)
+        return
+
+    brain = make_brain(cfg)
+
     if args.cmd == "init":
         handle_init(brain, cfg)
-    elif args.cmd == "stop":
-        handle_stop(brain)
+    elif args.cmd == "shell":
+        handle_shell(brain, cfg)
     elif args.cmd == "chat":
-        handle_run(brain, " ".join(args.prompt), cfg, act=False)
+        handle_run(brain, " ".join(args.prompt), cfg, act=False, context_mode=args.context)
     elif args.cmd == "act":
-        handle_run(brain, " ".join(args.prompt), cfg, act=True)
-    else:
-        parser.print_help()
+        handle_run(brain, " ".join(args.prompt), cfg, act=True, context_mode=args.context)
 
 
 if __name__ == "__main__":